@@ -1,12 +1,19 @@
 import streamlit as st
 import pandas as pd
-import io
 import time
 import json
 import os
 import datetime
-from src.extractor import extract_from_pdf
-from src.aggregator import calculate_weekly_summary
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+from src.cache import ExtractionCache, upload_fingerprint
+from src.store import HistoryStore
+from src.instrumentation import records_to_frame
+from src.aggregator import WeeklyAggregator
+from src.rollup import RollupEngine
+from src.export import FORMATS, ReportExporter
+from src import schema
 
 st.set_page_config(page_title="売上PDF集計アプリ", layout="wide")
 
@@ -33,65 +40,238 @@ st.markdown("""
 自動的に数値を読み取り、ブロック業種ごとの週次サマリーを作成します。
 """)
 
+# Upper bound on files extracted at the same time (each OCR pass holds a 300dpi page in memory)
+MAX_WORKERS = 4
+
+@st.cache_resource
+def get_extraction_cache():
+    """
+    Disk cache shared by all sessions; survives restarts as long as the cache directory does.
+    """
+    return ExtractionCache()
+
+@st.cache_resource
+def get_report_exporter():
+    return ReportExporter()
+
+@st.cache_resource
+def get_history_store():
+    """
+    Local history of every extracted day and manual correction (see src/store.py).
+    """
+    return HistoryStore()
+
 @st.cache_data(ttl="2h")
-def process_file_content(file_bytes, filename):
+def process_file_content(digest, filename, _read_bytes):
     """
     Cache the expensive OCR/extraction process.
-    Pass file content as bytes to ensure proper hashing.
+    Keyed by the upload's content hash (computed once per file, see upload_fingerprint),
+    so Streamlit never hashes the PDF bytes itself; _read_bytes is only called when
+    the on-disk cache misses too.
     """
-    # Wrap bytes back into a file-like object for pdfplumber
-    file_obj = io.BytesIO(file_bytes)
-    return extract_from_pdf(file_obj, filename=filename)
+    # Pages are extracted serially here: this runs on the upload threads, and a page pool
+    # forked from a multithreaded process can inherit a lock another thread holds (e.g.
+    # while an OCR engine loads) and hang. The CLI and the watcher keep page parallelism.
+    return get_extraction_cache().get_or_extract(_read_bytes, filename, digest=digest, page_jobs=1)
 
 
-uploaded_files = st.file_uploader("PDFファイルをここにドラッグ＆ドロップ", type="pdf", accept_multiple_files=True)
+TOTAL_ZONE_PATTERN = '軽井沢ＰＳＰ 計|総合計'
 
-if uploaded_files:
-    st.info(f"{len(uploaded_files)} 個のファイルを処理中...")
+def date_label(date):
+    return date.strftime('%Y%m%d') if pd.notna(date) else "Unknown"
+
+def ingest_file(name, df):
+    """
+    Runs the per-file validation once, when a file is first uploaded.
+    Valid rows are split by date so a manual override can replace a single day.
+    """
+    entry = {'name': name, 'errors': [], 'warnings': [], 'valid': {}, 'totals': {}, 'record': None}
+    if df is None or df.empty:
+        return entry
+    entry['record'] = df.attrs.get('extraction')
     
-    extracted_data = [] # Raw extraction from PDFs
+    # --- Error Handling & Validation ---
+    # 1. Unreadable File Markers
+    err_mask = df['Status'] == schema.STATUS_ERROR
+    for _, row in df[err_mask].iterrows():
+        entry['errors'].append(f"📄 **{name}** (読み取り失敗: {date_label(row['Date'])})")
     
-    progress_bar = st.progress(0)
+    # 2. Suspicious Data (Sales = 0) - likely misread or empty but valid PDF
+    # We assume Sales=0 is impossible for a business day, as per user.
+    total_mask = df['Zone'].str.contains(TOTAL_ZONE_PATTERN, na=False) # Only check Total rows for strictness
+    for _, row in df[~err_mask & (df['Sales'] == 0) & total_mask].iterrows():
+        entry['warnings'].append(f"⚠️ **日付: {date_label(row['Date'])}** (売上0円 - 誤検知の可能性あり)")
     
-    for i, file in enumerate(uploaded_files):
-        # Streamlit file object works with pdfplumber
-        # Pass bytes to cached function
-        df = process_file_content(file.getvalue(), file.name)
-        if df is not None and not df.empty:
-            extracted_data.append(df)
-        progress_bar.progress((i + 1) / len(uploaded_files))
-        
-    if extracted_data:
-        raw_concatenated = pd.concat(extracted_data, ignore_index=True)
+    # 3. No date in the file name: the rows cannot be placed in a week, so the file is flagged
+    undated = ~err_mask & df['Date'].isna()
+    if undated.any():
+        entry['errors'].append(f"📄 **{name}** (日付不明: ファイル名に日付がありません)")
+    
+    # Filter out invalid rows from main data
+    valid = df[~err_mask & ~undated & (df['Sales'] > 0)]
+    for date, rows in valid.groupby('Date'):
+        entry['valid'][date] = rows
+        entry['totals'][date] = rows[rows['Zone'].str.contains(TOTAL_ZONE_PATTERN, na=False)]
+    return entry
+
+def sync_sources():
+    """
+    Brings the running aggregate in line with the current uploads and manual entries.
+    Each (file, date) or manual date is one source; only sources that appeared or
+    disappeared since the last rerun are added to / removed from the aggregator.
+    """
+    manual = st.session_state['manual_data']
+    desired = {}
+    for file_id, entry in st.session_state['files'].items():
+        for date in entry['valid']:
+            # Strategy: If Manual Data exists for a Date, drop the Extracted Data for that Date (to prevent dupes/conflicts)
+            if date not in manual:
+                desired[('file', file_id, date)] = entry
+    for date, manual_entry in manual.items():
+        desired[('manual', date)] = manual_entry
+    
+    active = st.session_state['active_sources']
+    aggregator = st.session_state['aggregator']
+    for key in list(active):
+        if key not in desired or desired[key] is not active[key]['owner']:
+            aggregator.remove(active.pop(key)['rows'])
+    for key, owner in desired.items():
+        if key in active:
+            continue
+        if key[0] == 'manual':
+            rows = schema.extracted_frame([owner])
+            totals = rows
+        else:
+            rows = owner['valid'][key[2]]
+            totals = owner['totals'][key[2]]
+        aggregator.add(rows)
+        active[key] = {'owner': owner, 'rows': rows, 'totals': totals}
+
+# --- Per-file results and running aggregate (survive reruns) ---
+if 'files' not in st.session_state:
+    st.session_state['files'] = {}
+    st.session_state['active_sources'] = {}
+    st.session_state['aggregator'] = WeeklyAggregator()
+# -------------------------------
+
+uploaded_files = st.file_uploader("PDFファイルをここにドラッグ＆ドロップ", type="pdf", accept_multiple_files=True)
+
+# --- Summary from stored history (no upload needed) ---
+@st.cache_resource(max_entries=1)
+def get_rollups(store_version):
+    """
+    Rollups over the whole stored history; rebuilt only when the store changes.
+    """
+    return RollupEngine(get_history_store().read_range())
+
+with st.expander("📚 保存済みデータから集計", expanded=not uploaded_files):
+    stored_dates = get_history_store().dates()
+    if stored_dates:
+        rollups = get_rollups(get_history_store().version())
+        period = st.radio("集計期間", ["期間指定", "月初来", "直近4週間"], horizontal=True)
+        # Preset periods come from the engine, so the caption and the sums use the same range
+        if period == "月初来":
+            h_start, h_end = rollups.month_to_date_range()
+            history_summary = rollups.month_to_date()
+        elif period == "直近4週間":
+            h_start, h_end = rollups.rolling_range(weeks=4)
+            history_summary = rollups.rolling(weeks=4)
+        else:
+            col_h1, col_h2 = st.columns(2)
+            h_start = col_h1.date_input("開始日", value=max(stored_dates[0], stored_dates[-1] - pd.Timedelta(days=6)),
+                                        min_value=stored_dates[0], max_value=stored_dates[-1])
+            h_end = col_h2.date_input("終了日", value=stored_dates[-1], min_value=stored_dates[0], max_value=stored_dates[-1])
+            history_summary = rollups.summary(h_start, h_end)
+        if history_summary.empty:
+            st.info("指定期間のデータがありません。")
+        else:
+            st.caption(f"集計対象: {h_start:%Y%m%d} 〜 {h_end:%Y%m%d}")
+            st.dataframe(history_summary, use_container_width=True, hide_index=True)
+            if st.checkbox("前年同期と比較（保存済みデータ）"):
+                history_yoy = rollups.year_over_year(h_start, h_end)
+                # No figures a year earlier (e.g. a new zone): no ratio, shown as —
+                for col in ['Sales_YoY_History', 'Count_YoY_History']:
+                    history_yoy[col] = history_yoy[col].map(lambda x: f"{x:.1f}%" if pd.notna(x) else "—")
+                st.dataframe(history_yoy, use_container_width=True, hide_index=True)
+    else:
+        st.info("保存済みのデータはまだありません。PDFをアップロードすると自動的に保存されます。")
+
+# Forget files that were removed from the uploader
+current_ids = {file.file_id for file in uploaded_files or []}
+for file_id in list(st.session_state['files']):
+    if file_id not in current_ids:
+        del st.session_state['files'][file_id]
+
+if uploaded_files:
+    new_files = [file for file in uploaded_files if file.file_id not in st.session_state['files']]
+    
+    if new_files:
+        st.info(f"{len(new_files)} 個のファイルを処理中...")
         
-        # --- Error Handling & Validation ---
-        # 1. Unreadable File Markers
-        error_df_ocr = raw_concatenated[raw_concatenated['Zone'].str.contains('ERR:', na=False)].copy()
+        progress_bar = st.progress(0)
+        status_area = st.container()
         
-        # 2. Suspicious Data (Sales = 0) - likely misread or empty but valid PDF
-        # We assume Sales=0 is impossible for a business day, as per user.
-        warnings_df = raw_concatenated[
-            (~raw_concatenated['Zone'].str.contains('ERR:', na=False)) & 
-            (raw_concatenated['Sales'] == 0) &
-            (raw_concatenated['Zone'].str.contains('軽井沢ＰＳＰ 計|総合計', na=False)) # Only check Total rows for strictness
-        ].copy()
+        # Fan files out to a bounded pool; threads overlap fine, since OCR runs in
+        # tesserocr (which releases the GIL while Tesseract works) or in tesseract
+        # subprocesses when pytesseract is the fallback.
+        ctx = get_script_run_ctx()
+        with ThreadPoolExecutor(
+            max_workers=min(MAX_WORKERS, len(new_files)),
+            initializer=lambda: add_script_run_ctx(threading.current_thread(), ctx)
+        ) as executor:
+            # Only the fingerprint goes to the cached function; bytes are read on a cache miss
+            futures = {}
+            for file in new_files:
+                fingerprint = upload_fingerprint(file)
+                future = executor.submit(process_file_content, fingerprint.sha256, file.name, file.getvalue)
+                futures[future] = (file, fingerprint)
+            for done, future in enumerate(as_completed(futures), start=1):
+                file, fingerprint = futures[future]
+                try:
+                    df = future.result()
+                except Exception as e:
+                    df = None
+                    status_area.write(f"❌ {file.name}: {e}")
+                entry = ingest_file(file.name, df)
+                if df is not None:
+                    if not df.empty and not entry['errors']:
+                        status_area.write(f"✅ {file.name} ({len(df)} 行)")
+                    elif not df.empty and not (df['Status'] == schema.STATUS_ERROR).any():
+                        status_area.write(f"⚠️ {file.name} (日付不明)")
+                    else:
+                        status_area.write(f"⚠️ {file.name} (読み取り失敗)")
+                st.session_state['files'][file.file_id] = entry
+                st.session_state['files'][file.file_id]['fingerprint'] = fingerprint
+                # Keep the extracted day in the local history. A source already stored (a re-upload,
+                # or a file the watcher ingested) is left alone: every write bumps the store
+                # version and makes get_rollups re-read the whole history
+                store = get_history_store()
+                if not store.has_source(fingerprint.sha256):
+                    store.add_rows(df, fingerprint.sha256)
+                progress_bar.progress(done / len(new_files))
+
+sync_sources()
+
+if uploaded_files:
+    # Keep upload order for messages and tables
+    entries = [st.session_state['files'][file.file_id] for file in uploaded_files]
+    
+    cache_stats = get_extraction_cache().stats()
+    st.sidebar.caption(f"抽出キャッシュ: ヒット {cache_stats['hits']} / ミス {cache_stats['misses']}")
+    
+    # Per-file timing records from the extractor (slowest first)
+    timing_records = [entry['record'] for entry in entries if entry['record']]
+    if timing_records:
+        with st.expander("⏱️ 処理時間（ファイル別）", expanded=False):
+            timing_df = records_to_frame(timing_records)
+            if 'total (ms)' in timing_df.columns:
+                timing_df = timing_df.sort_values('total (ms)', ascending=False, na_position='last')
+            st.dataframe(timing_df, use_container_width=True, hide_index=True)
         
+    if any(entry['record'] or entry['valid'] or entry['errors'] for entry in entries):
         # Combine errors
-        unique_errors = []
-        if not error_df_ocr.empty:
-            for _, row in error_df_ocr.iterrows():
-                fname = row['Zone'].split(':')[-1]
-                unique_errors.append(f"📄 **{fname}** (読み取り失敗: {row['Date']})")
-        
-        if not warnings_df.empty:
-             for _, row in warnings_df.iterrows():
-                unique_errors.append(f"⚠️ **日付: {row['Date']}** (売上0円 - 誤検知の可能性あり)")
-
-        # Filter out invalid rows from main data
-        valid_df = raw_concatenated[
-            (~raw_concatenated['Zone'].str.contains('ERR:', na=False)) & 
-            (raw_concatenated['Sales'] > 0)
-        ]
+        unique_errors = [err for entry in entries for err in entry['errors']]
+        unique_errors += [warn for entry in entries for warn in entry['warnings']]
         
         # Explicit Error Display
         if unique_errors:
@@ -129,7 +309,9 @@ if uploaded_files:
                 
                 submitted = st.form_submit_button("データ保存/上書き")
                 
-                if submitted and m_date:
+                if submitted and m_date and pd.isna(schema.parse_date(m_date)):
+                    st.error(f"日付の形式が正しくありません: {m_date}（例: 20260201）")
+                elif submitted and m_date:
                     # Parse text inputs
                     m_sales = clean_num_input(m_sales_str)
                     m_sales_yoy = clean_float_input(m_sales_yoy_str)
@@ -138,54 +320,36 @@ if uploaded_files:
                     
                     # Save into session state
                     new_entry = {
-                        'Date': m_date,
+                        'Date': schema.parse_date(m_date),
                         'Zone': '【軽井沢ＰＳＰ 計】', # Manual entry is always treated as Total
                         'Sales': m_sales,
                         'Sales_YoY': m_sales_yoy,
                         'Count': m_count,
                         'Count_YoY': m_count_yoy
                     }
-                    st.session_state['manual_data'][m_date] = new_entry
-                    # save_manual_data(st.session_state['manual_data']) # DISABLED: Ephemeral only
-                    st.success(f"{m_date} のデータを保存しました（一時的）。")
+                    st.session_state['manual_data'][new_entry['Date']] = new_entry
+                    # Kept in the history store (replaces an earlier entry for the same date)
+                    get_history_store().add_manual(new_entry)
+                    st.success(f"{m_date} のデータを保存しました（履歴に保存済み）。")
                     st.rerun()
 
-        # --- Merge Manual Data ---
-        if st.session_state['manual_data']:
-            manual_list = list(st.session_state['manual_data'].values())
-            manual_df = pd.DataFrame(manual_list)
-            
-            # Strategy: If Manual Data exists for a Date, drop the Extracted Data for that Date (to prevent dupes/conflicts)
-            manual_dates = set(manual_df['Date'].astype(str).str.strip())
-            
-            # Ensure Date is string matchable
-            valid_df['Date'] = valid_df['Date'].astype(str).str.strip()
-            
-            # Filter out extracted rows that conflict with manual dates
-            filtered_valid_df = valid_df[~valid_df['Date'].isin(manual_dates)]
-            
-            combined_df = pd.concat([filtered_valid_df, manual_df], ignore_index=True)
-        else:
-            combined_df = valid_df
-
         # --- Calculate Summary ---
-        summary_df = calculate_weekly_summary(combined_df)
+        # Manual data was merged by sync_sources(); the aggregator already holds the result
+        summary_df = st.session_state['aggregator'].summary()
         
         # --- Data Validation (Day Count) ---
-        unique_dates = sorted(combined_df['Date'].astype(str).unique())
+        unique_dates = sorted({key[-1] for key in st.session_state['active_sources']})
         day_count = len(unique_dates)
         date_range_str = "データなし"
         missing_warning = ""
         
         if day_count > 0:
-            start_date = unique_dates[0]
-            end_date = unique_dates[-1]
-            date_range_str = f"{start_date} 〜 {end_date}"
+            d1 = unique_dates[0]
+            d2 = unique_dates[-1]
+            date_range_str = f"{d1:%Y%m%d} 〜 {d2:%Y%m%d}"
             
             # Gap Check (Simple heuristic: count vs days between)
             try:
-                d1 = datetime.datetime.strptime(start_date, "%Y%m%d")
-                d2 = datetime.datetime.strptime(end_date, "%Y%m%d")
                 delta_days = (d2 - d1).days + 1
                 if day_count < delta_days:
                      missing_warning = f"⚠️ 日付に抜けがあります（期間: {delta_days}日間 / データ: {day_count}日分）。下のリストで不足日を確認してください。"
@@ -225,32 +389,50 @@ if uploaded_files:
         with col2:
             st.subheader("📥 ダウンロード")
             
-            buffer = io.BytesIO()
-            with pd.ExcelWriter(buffer, engine='openpyxl') as writer:
-                summary_df.to_excel(writer, sheet_name='週次サマリー', index=False)
-                combined_df.to_excel(writer, sheet_name='日別詳細', index=False)
-                
-            st.download_button(
-                label="Excelファイルをダウンロード",
-                data=buffer.getvalue(),
-                file_name=f"売上集計_{time.strftime('%Y%m%d')}.xlsx",
-                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                key="download_btn"
-            )
+            # Built only when a button is clicked, and reused while the data is unchanged
+            detail_frames = [source['rows'] for source in st.session_state['active_sources'].values()]
+            exporter = get_report_exporter()
+
+            def export_data(fmt, sheet_name=None):
+                return lambda: exporter.export(
+                    {'週次サマリー': summary_df, '日別詳細': schema.concat(detail_frames)}, fmt, sheet_name)
+
+            export_format = st.radio("形式", list(FORMATS), format_func=lambda f: FORMATS[f][0], horizontal=True)
+            label, mime = FORMATS[export_format]
+            stamp = time.strftime('%Y%m%d')
+            if export_format == 'xlsx':
+                st.download_button(
+                    label=f"{label}ファイルをダウンロード",
+                    data=export_data('xlsx'),
+                    file_name=f"売上集計_{stamp}.xlsx",
+                    mime=mime,
+                    on_click="ignore",
+                    key="download_btn"
+                )
+            else:
+                for sheet_name in ['週次サマリー', '日別詳細']:
+                    st.download_button(
+                        label=f"{sheet_name}（{label}）をダウンロード",
+                        data=export_data(export_format, sheet_name),
+                        file_name=f"売上集計_{sheet_name}_{stamp}.{export_format}",
+                        mime=mime,
+                        on_click="ignore",
+                        key=f"download_btn_{sheet_name}"
+                    )
             
         with st.expander("📅 日別詳細データ（サマリー）", expanded=True):
             st.write("各日の総合計一覧です。")
-            if not combined_df.empty:
-                # Filter for Total Zone, sort, and Drop Duplicates to be safe
-                daily_view = combined_df[combined_df['Zone'].str.contains('軽井沢ＰＳＰ 計|総合計', na=False)].copy()
+            total_frames = [source['totals'] for source in st.session_state['active_sources'].values()]
+            if total_frames:
+                # Total Zone rows were filtered per source at ingest; sort and Drop Duplicates to be safe
+                daily_view = pd.concat(total_frames, ignore_index=True)
                 
                 # Robust Deduplication
-                # Ensure Date is strictly string and clean
-                daily_view['Date'] = daily_view['Date'].astype(str).str.strip()
                 daily_view = daily_view.sort_values('Date')
                 
                 # Deduplicate by Date, keeping the last (last is usually better if sorted or manual appends)
                 daily_view = daily_view.drop_duplicates(subset=['Date'], keep='last')
+                daily_view['Date'] = schema.format_date(daily_view['Date'])
                 
                 # Consistent Formatting
                 try:
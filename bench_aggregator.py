@@ -0,0 +1,67 @@
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.aggregator import calculate_weekly_summary
+
+
+def legacy_last_year_columns(daily_df):
+    # The previous row-wise implementation, kept here as the baseline
+    def get_last_year(current, yoy):
+        if yoy == 0:
+            return 0
+        return current / (yoy / 100)
+
+    daily_df['Last_Year_Sales'] = daily_df.apply(lambda x: get_last_year(x['Sales'], x['Sales_YoY']), axis=1)
+    daily_df['Last_Year_Count'] = daily_df.apply(lambda x: get_last_year(x['Count'], x['Count_YoY']), axis=1)
+    return daily_df
+
+
+def make_rows(n, seed=0):
+    rng = np.random.default_rng(seed)
+    zones = [f"【ゾーン{i:02d}】" for i in range(40)] + ['【軽井沢ＰＳＰ 計】', '【総合計】']
+    dates = pd.date_range('2025-01-01', periods=max(1, n // len(zones)) + 1).strftime('%Y%m%d')
+    sales_yoy = rng.uniform(60, 140, n).round(1)
+    sales_yoy[rng.random(n) < 0.05] = 0.0  # new zones without last year's figures
+    return pd.DataFrame({
+        'Date': rng.choice(dates, n),
+        'Zone': rng.choice(zones, n),
+        'Sales': rng.integers(0, 5_000_000, n),
+        'Sales_YoY': sales_yoy,
+        'Count': rng.integers(0, 3_000, n),
+        'Count_YoY': rng.uniform(60, 140, n).round(1),
+    })
+
+
+def best_of(fn, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    # Legacy time covers only the two apply() columns; vectorized time is the whole summary
+    print(f"{'rows':>10} {'legacy apply':>14} {'vectorized':>12} {'speedup':>9}")
+    for n in [10_000, 100_000, 1_000_000]:
+        df = make_rows(n)
+        repeat = 3 if n < 1_000_000 else 1
+
+        legacy = best_of(lambda: legacy_last_year_columns(df.copy()), repeat)
+        vectorized = best_of(lambda: calculate_weekly_summary(df), repeat)
+
+        # Both paths must agree on the final weighted YoY
+        expected = legacy_last_year_columns(df.copy())
+        grouped = expected.groupby('Zone')[['Sales', 'Last_Year_Sales']].sum()
+        expected_yoy = (grouped['Sales'] / grouped['Last_Year_Sales'] * 100).fillna(0).round(1)
+        actual = calculate_weekly_summary(df).set_index('Zone')['Sales_YoY']
+        assert (expected_yoy.loc[actual.index] == actual).all(), "YoY mismatch"
+
+        print(f"{n:>10,} {legacy:>13.3f}s {vectorized:>11.3f}s {legacy / vectorized:>8.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+import argparse
+import io
+import time
+
+import pandas as pd
+
+from src.aggregator import calculate_weekly_summary
+from src.export import ReportExporter, to_csv, to_excel, to_parquet
+from src import schema
+from src.synthetic import make_report_rows
+
+
+def legacy_excel(summary_df, detail_df):
+    # The previous export, rebuilt on every rerun
+    buffer = io.BytesIO()
+    with pd.ExcelWriter(buffer, engine='openpyxl') as writer:
+        summary_df.to_excel(writer, sheet_name='週次サマリー', index=False)
+        detail_df.to_excel(writer, sheet_name='日別詳細', index=False)
+    return buffer.getvalue()
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    data = fn(*args)
+    return time.perf_counter() - start, len(data)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark report export formats.")
+    parser.add_argument('--days', type=int, default=365)
+    args = parser.parse_args()
+
+    days = pd.date_range('2025-01-01', periods=args.days)
+    rows = [dict(row, Date=day.strftime('%Y%m%d'))
+            for day in days for row in make_report_rows(day.strftime('%Y%m%d'))]
+    detail_df = schema.extracted_frame(rows)
+    summary_df = calculate_weekly_summary(detail_df)
+    sheets = {'週次サマリー': summary_df, '日別詳細': detail_df}
+    print(f"{len(detail_df)} detail rows over {args.days} days\n")
+
+    exporter = ReportExporter()
+    results = [
+        ('openpyxl via pandas (old)', timed(legacy_excel, summary_df, detail_df)),
+        ('excel streaming', timed(to_excel, sheets)),
+        ('csv (detail)', timed(to_csv, detail_df)),
+        ('parquet (detail)', timed(to_parquet, detail_df)),
+        ('excel, cached', (timed(exporter.export, sheets, 'xlsx'), timed(exporter.export, sheets, 'xlsx'))[1]),
+    ]
+    for name, (seconds, size) in results:
+        print(f"{name:<28} {seconds * 1000:9.1f} ms {size / 1024:9.0f} KiB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+import argparse
+import statistics
+import tempfile
+import time
+import tracemalloc
+
+from src import ocr
+from src.extractor import TEXT_ENGINES, extract_from_pdf
+from src.synthetic import STYLES, generate_corpus
+
+
+def accuracy(df, rows):
+    # 准合計 is dropped by the extractor on purpose
+    expected = {r['Zone']: r for r in rows if r['Zone'] != '准合計'}
+    if df is None or df.empty:
+        return 0, len(expected), 0
+    matched = 0
+    for _, row in df.iterrows():
+        truth = expected.get(row['Zone'])
+        if truth and row['Sales'] == truth['Sales'] and row['Count'] == truth['Count'] \
+                and abs(row['Sales_YoY'] - truth['Sales_YoY']) < 0.05 \
+                and abs(row['Count_YoY'] - truth['Count_YoY']) < 0.05:
+            matched += 1
+    # Rows that are not in the report at all (e.g. a footer line read as a zone)
+    extra = int((~df['Zone'].isin(list(expected))).sum())
+    return matched, len(expected), extra
+
+
+def run(corpus, repeat=1, records=None, engine=None):
+    results = {}
+    records = records if records is not None else []
+    for path, (style, date_str, rows) in corpus.items():
+        for _ in range(repeat):
+            tracemalloc.start()
+            start = time.perf_counter()
+            df = extract_from_pdf(path, engine=engine)
+            elapsed = time.perf_counter() - start
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            matched, expected, extra = accuracy(df, rows)
+            record = df.attrs.get('extraction') if df is not None else None
+            # Pages the extractor actually went through ('multipage' reports have several)
+            pages = (record or {}).get('pages_read') or 0
+            results.setdefault(style, []).append((elapsed, peak, matched, expected, extra, pages))
+            if record is not None:
+                records.append(record)
+    return results
+
+
+def report(results):
+    print(f"\n{'style':<12} {'files':>5} {'mean ms':>9} {'p50 ms':>8} {'max ms':>8} {'pages/s':>8} {'peak MB':>8} {'rows ok':>9} {'extra':>5}")
+    for style, samples in results.items():
+        times = [s[0] for s in samples]
+        peaks = [s[1] for s in samples]
+        matched = sum(s[2] for s in samples)
+        expected = sum(s[3] for s in samples)
+        extra = sum(s[4] for s in samples)
+        pages = sum(s[5] for s in samples)
+        print(f"{style:<12} {len(samples):>5} {statistics.mean(times) * 1000:>9.1f} "
+              f"{statistics.median(times) * 1000:>8.1f} {max(times) * 1000:>8.1f} "
+              f"{pages / sum(times):>8.1f} {max(peaks) / 2**20:>8.1f} "
+              f"{matched:>4}/{expected:<4} {extra:>5}")
+
+
+def report_stages(records):
+    # Mean time per stage, grouped by the strategy that ended up producing the rows
+    by_strategy = {}
+    for record in records:
+        by_strategy.setdefault(record['strategy'], []).append(record)
+    for strategy, group in by_strategy.items():
+        stages = {}
+        for record in group:
+            for name, seconds in record['stages'].items():
+                stages.setdefault(name, []).append(seconds)
+        summary = "  ".join(f"{name}={statistics.mean(v) * 1000:.1f}ms" for name, v in stages.items())
+        print(f"{strategy} ({len(group)} files): {summary}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark extract_from_pdf on the synthetic report corpus.")
+    parser.add_argument('--days', type=int, default=7)
+    parser.add_argument('--repeat', type=int, default=1)
+    parser.add_argument('--styles', nargs='+', choices=STYLES, default=STYLES)
+    parser.add_argument('--corpus-dir', help="reuse/keep the generated PDFs here instead of a temp dir")
+    parser.add_argument('--engines', nargs='+', choices=TEXT_ENGINES, default=list(TEXT_ENGINES),
+                        help="text engines to compare on the same files")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        corpus = generate_corpus(args.corpus_dir or tmp_dir, days=args.days, styles=args.styles)
+        runs = {}
+        for engine in args.engines:
+            records = []
+            runs[engine] = (run(corpus, args.repeat, records, engine), records)
+    # peak MB is Python-heap only (tracemalloc); pdfium/tesseract native memory is not included
+    for engine, (results, records) in runs.items():
+        print(f"\n== engine: {engine}")
+        report(results)
+        report_stages(records)
+    engine = ocr.get_engine()
+    if engine is not None and engine.stats()['calls']:
+        # Per-call OCR latency and throughput of this process's engine (scans only)
+        print(f"\nOCR engine: {engine.stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+import argparse
+import io
+import resource
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from src import ocr
+from src.extractor import extract_from_pdf
+from src.synthetic import make_report_rows, report_filename, scan_pdf_bytes
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Concurrent scan uploads through the OCR scheduler, with a fake OCR engine "
+                    "standing in for Tesseract (renders and crops are real).")
+    parser.add_argument('--files', type=int, default=12)
+    parser.add_argument('--threads', type=int, default=6, help="concurrent uploads (app sessions)")
+    parser.add_argument('--budget-mb', type=float, default=ocr.OCR_MEMORY_MB, help="OCR memory budget")
+    parser.add_argument('--downgrade-after', type=float, default=ocr.DOWNGRADE_AFTER)
+    parser.add_argument('--latency', type=float, default=0.5, help="seconds per fake OCR call")
+    args = parser.parse_args()
+
+    scans = []
+    for day in range(args.files):
+        date_str = f"202601{day % 28 + 1:02d}"
+        scans.append((report_filename(date_str), scan_pdf_bytes(date_str, make_report_rows(date_str), dpi=150)))
+
+    ocr.set_engine(ocr.FakeOcrEngine(text="ブロック／業種 純売上高 客数", latency=args.latency))
+    scheduler = ocr.OcrScheduler(int(args.budget_mb * 2**20), downgrade_after=args.downgrade_after)
+    ocr.set_scheduler(scheduler)
+
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as executor:
+        list(executor.map(lambda scan: extract_from_pdf(io.BytesIO(scan[1]), filename=scan[0],
+                                                        engine='pdfplumber'), scans))
+    elapsed = time.perf_counter() - start
+    # ru_maxrss is KiB on Linux
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    print(f"\n{args.files} scans, {args.threads} threads, budget {args.budget_mb:.0f} MB: {elapsed:.1f} s")
+    print(f"peak RSS {peak / 1024:.0f} MB (before the run {baseline / 1024:.0f} MB)")
+    print(f"scheduler: {scheduler.stats()}")
+    print(f"engine: {ocr.get_engine().stats()}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+import argparse
+import io
+import statistics
+import time
+import tracemalloc
+
+import pdfplumber
+
+from src import ocr
+from src.preprocess import STEPS, estimate_skew, preprocess, to_array
+from src.synthetic import make_report_rows, scan_pdf_bytes
+
+# Each configuration adds one step to the previous one
+CONFIGS = [STEPS[:n] for n in range(len(STEPS) + 1)]
+
+
+def render(pdf_bytes, dpi):
+    # As the extractor renders before any preprocessing (RGB)
+    with pdfplumber.open(io.BytesIO(pdf_bytes)) as pdf:
+        return pdf.pages[0].to_image(resolution=dpi).original
+
+
+def numbers_found(text, rows):
+    # Share of the report's numbers (as printed) that appear in the OCR text
+    compact = text.replace(' ', '')
+    numbers = [f"{row[key]:,}" for row in rows for key in ('Sales', 'Count')]
+    return sum(number in compact for number in numbers) / len(numbers)
+
+
+def ocr_engine():
+    engine = ocr.get_engine()
+    if engine is None:
+        return None
+    try:
+        engine.image_to_string(render(scan_pdf_bytes('20260101', make_report_rows('20260101')), 72))
+    except Exception as e:
+        print(f"OCR unavailable ({e}); reporting preprocessing only.")
+        return None
+    return engine
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark OCR preprocessing steps on synthetic scans.")
+    parser.add_argument('--pages', type=int, default=6)
+    parser.add_argument('--dpi', type=int, default=300)
+    parser.add_argument('--skews', type=float, nargs='+', default=[0.0, 0.8, -1.5, 2.5],
+                        help="scanner skew in degrees, cycled over the pages")
+    parser.add_argument('--noise', type=float, default=0.002)
+    args = parser.parse_args()
+
+    pages = []
+    for i in range(args.pages):
+        date_str = f"202601{i % 28 + 1:02d}"
+        rows = make_report_rows(date_str, seed=i)
+        skew = args.skews[i % len(args.skews)]
+        pdf_bytes = scan_pdf_bytes(date_str, rows, rotate=skew, dpi=200, noise=args.noise, seed=i)
+        pages.append((render(pdf_bytes, args.dpi), rows, skew))
+
+    engine = ocr_engine()
+    skew_errors = [abs(estimate_skew(to_array(img.convert('L'))) - skew) for img, rows, skew in pages]
+    print(f"{len(pages)} pages at {args.dpi}dpi, skew estimate error: "
+          f"mean {statistics.mean(skew_errors):.2f}, max {max(skew_errors):.2f} degrees\n")
+
+    print(f"{'steps':<34} {'prep ms':>8} {'peak MB':>8} {'Mpx':>6} {'PNG KiB':>8} {'PNG ms':>7} {'OCR ms':>8} {'numbers':>8}")
+    for steps in CONFIGS:
+        prep_times, peaks, pixels, sizes, encode_times, ocr_times, found = [], [], [], [], [], [], []
+        for img, rows, skew in pages:
+            tracemalloc.start()
+            start = time.perf_counter()
+            out, info = preprocess(img, steps)
+            prep_times.append(time.perf_counter() - start)
+            peaks.append(tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+            pixels.append(out.width * out.height)
+            # pytesseract hands each image to tesseract as a PNG file
+            start = time.perf_counter()
+            buffer = io.BytesIO()
+            out.save(buffer, format='PNG')
+            encode_times.append(time.perf_counter() - start)
+            sizes.append(buffer.tell())
+            if engine is not None:
+                start = time.perf_counter()
+                text = engine.image_to_string(out)
+                ocr_times.append(time.perf_counter() - start)
+                found.append(numbers_found(text, rows))
+        name = '+'.join(steps) or '(none, RGB)'
+        ocr_cols = (f"{statistics.mean(ocr_times) * 1000:>8.0f} {statistics.mean(found):>8.1%}"
+                    if engine is not None else f"{'n/a':>8} {'n/a':>8}")
+        print(f"{name:<34} {statistics.mean(prep_times) * 1000:>8.1f} "
+              f"{max(peaks) / 2**20:>8.1f} {statistics.mean(pixels) / 1e6:>6.2f} "
+              f"{statistics.mean(sizes) / 1024:>8.0f} {statistics.mean(encode_times) * 1000:>7.1f} {ocr_cols}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+import argparse
+import io
+import statistics
+import time
+
+import numpy as np
+import pdfplumber
+
+from src.render import PageRenderer
+from src.synthetic import make_report_rows, scan_pdf_bytes
+
+# Table clip (points, upright page) as the OCR path renders it
+CLIP = (30, 150, 565, 560)
+
+
+def via_pdfplumber(page, dpi, angle, box):
+    # The OCR path before: RGB render, grayscale, rotate, crop
+    rgb = page.to_image(resolution=dpi).original
+    gray = rgb.convert('L')
+    rotated = gray.rotate(angle, expand=True) if angle else gray
+    cropped = rotated.crop(box)
+    held = sum(im.width * im.height * len(im.getbands()) for im in {id(im): im for im in
+                                                                     (rgb, gray, rotated, cropped)}.values())
+    return np.asarray(cropped), held
+
+
+def via_pdfium(page, dpi, angle, clip):
+    with PageRenderer.for_page(page) as renderer:
+        arr = renderer.render(dpi, clip=clip, rotate=angle)
+    return arr, arr.nbytes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Page rasterization for OCR: pdfplumber vs pdfium direct.")
+    parser.add_argument('--dpi', type=int, default=300)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    pdf_bytes = scan_pdf_bytes('20260126', make_report_rows('20260126'), rotate=180, dpi=200)
+    scale = args.dpi / 72
+    box = tuple(int(round(v * scale)) for v in CLIP)
+    with pdfplumber.open(io.BytesIO(pdf_bytes)) as pdf:
+        page = pdf.pages[0]
+        for label, clip in [('full page', None), ('table clip', CLIP)]:
+            page_box = box if clip else (0, 0, int(page.width * scale), int(page.height * scale))
+            results = {}
+            for name, render, area in [('pdfplumber', via_pdfplumber, page_box), ('pdfium', via_pdfium, clip)]:
+                times = []
+                for _ in range(args.repeat):
+                    start = time.perf_counter()
+                    arr, held = render(page, args.dpi, 180, area)
+                    times.append(time.perf_counter() - start)
+                results[name] = arr
+                print(f"{label:<11} {name:<11} {statistics.median(times) * 1000:>7.1f} ms  "
+                      f"{held / 2**20:>6.1f} MB allocated  output {arr.shape}")
+            a, b = results['pdfplumber'], results['pdfium']
+            h, w = min(a.shape[0], b.shape[0]), min(a.shape[1], b.shape[1])
+            print(f"{'':<11} mean pixel difference {np.abs(a[:h, :w].astype(int) - b[:h, :w]).mean():.2f}\n")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,24 +1,46 @@
+import numpy as np
 import pandas as pd
 
-def calculate_weekly_summary(daily_df):
-    if daily_df.empty:
-        return pd.DataFrame()
+def get_last_year(current, yoy):
+    """
+    Last year's value from this year's value and YoY (%), column-wise.
+    Rows with YoY == 0 get 0 instead of a division by zero.
+    """
+    current = np.asarray(current, dtype=np.float64)
+    yoy = np.asarray(yoy, dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        last_year = current / (yoy / 100)
+    return np.where(yoy == 0, 0.0, last_year)
 
+SUM_COLUMNS = ['Sales', 'Last_Year_Sales', 'Count', 'Last_Year_Count']
+
+def zone_sums(daily_df):
+    """
+    Per-zone sums of Sales, Last_Year_Sales, Count and Last_Year_Count.
+    This is the additive part of the weekly summary; YoY is derived from it afterwards.
+    """
     # Calculate Last Year's Numbers to compute accurate Weighted YoY
     # Last Year Sales = Sales / (YoY / 100)
     # Handle division by zero or empty YoY
-    
-    def get_last_year(current, yoy):
-        if yoy == 0:
-            return 0
-        return current / (yoy / 100)
-
-    daily_df['Last_Year_Sales'] = daily_df.apply(lambda x: get_last_year(x['Sales'], x['Sales_YoY']), axis=1)
-    daily_df['Last_Year_Count'] = daily_df.apply(lambda x: get_last_year(x['Count'], x['Count_YoY']), axis=1)
+    # Work on a copy so the caller's frame is left untouched
+    daily_df = daily_df.assign(
+        Last_Year_Sales=get_last_year(daily_df['Sales'], daily_df['Sales_YoY']),
+        Last_Year_Count=get_last_year(daily_df['Count'], daily_df['Count_YoY']),
+    )
 
     # Group by Zone
     # We want to sum Sales, Last_Year_Sales, Count, Last_Year_Count
-    grouped = daily_df.groupby('Zone')[['Sales', 'Last_Year_Sales', 'Count', 'Last_Year_Count']].sum()
+    grouped = daily_df.groupby('Zone', observed=True)[SUM_COLUMNS].sum()
+    # Plain string index, so sums from frames with different Zone categories line up
+    grouped.index = grouped.index.astype(object)
+    # Count is int32 in the extracted schema; sums need the headroom
+    return grouped.astype({'Sales': 'int64', 'Count': 'int64'})
+
+def summarize_zone_sums(grouped):
+    """
+    Turns per-zone sums into the weekly summary table (weighted YoY, PSP total first).
+    """
+    grouped = grouped.copy()
 
     # Recalculate YoY
     grouped['Sales_YoY'] = (grouped['Sales'] / grouped['Last_Year_Sales'] * 100).fillna(0).round(1)
@@ -43,3 +65,52 @@ def calculate_weekly_summary(daily_df):
         summary = summary.sort_values('Sales', ascending=False)
 
     return summary
+
+def calculate_weekly_summary(daily_df):
+    if daily_df.empty:
+        return pd.DataFrame()
+
+    return summarize_zone_sums(zone_sums(daily_df))
+
+class WeeklyAggregator:
+    """
+    Incremental version of calculate_weekly_summary.
+    Keeps running per-zone sums, so rows can be fed (or withdrawn) file by file and a
+    summary produced at any point without holding or re-concatenating the raw rows.
+    """
+
+    def __init__(self):
+        self._sums = pd.DataFrame(columns=SUM_COLUMNS + ['Rows'], dtype='float64')
+        self._sums.index.name = 'Zone'
+        self.row_count = 0
+
+    def add(self, daily_df):
+        self._apply(daily_df, 1)
+
+    def remove(self, daily_df):
+        """
+        Withdraws rows previously passed to add(); zones left without rows disappear.
+        """
+        self._apply(daily_df, -1)
+
+    def _apply(self, daily_df, sign):
+        if daily_df is None or daily_df.empty:
+            return
+        delta = zone_sums(daily_df)
+        rows = daily_df.groupby('Zone', observed=True).size()
+        delta['Rows'] = rows.set_axis(rows.index.astype(object))
+        self._sums = self._sums.add(delta * sign, fill_value=0)
+        self._sums = self._sums[self._sums['Rows'] > 0]
+        self.row_count += sign * len(daily_df)
+
+    def zone_sums(self):
+        sums = self._sums[SUM_COLUMNS].copy()
+        # Sales/Count are whole numbers; restore the dtype calculate_weekly_summary produces
+        for col in ['Sales', 'Count']:
+            sums[col] = sums[col].round().astype('int64')
+        return sums
+
+    def summary(self):
+        if self._sums.empty:
+            return pd.DataFrame()
+        return summarize_zone_sums(self.zone_sums())
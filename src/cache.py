@@ -0,0 +1,155 @@
+import collections
+import hashlib
+import io
+import os
+import re
+import threading
+
+import pandas as pd
+
+from src import schema
+from src.extractor import EXTRACTOR_VERSION, extract_from_pdf
+from src.instrumentation import ExtractionRecord
+
+# Can be overridden per deployment (e.g. a mounted volume on the container)
+DEFAULT_CACHE_DIR = os.environ.get(
+    'WEEKLY_REPORT_CACHE_DIR',
+    os.path.join(os.path.expanduser('~'), '.cache', 'weekly-report')
+)
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+def content_hash(pdf_bytes):
+    return hashlib.sha256(pdf_bytes).hexdigest()
+
+
+UploadFingerprint = collections.namedtuple('UploadFingerprint', ['file_id', 'size', 'sha256'])
+
+
+def upload_fingerprint(uploaded_file):
+    """
+    Identity of a Streamlit upload: hashes the in-memory buffer without copying it.
+    Compute it once per file_id and keep it; the content never changes for an id.
+    """
+    return UploadFingerprint(uploaded_file.file_id, uploaded_file.size, content_hash(uploaded_file.getbuffer()))
+
+
+class ExtractionCache:
+    """
+    On-disk cache of extract_from_pdf results, one Parquet file per PDF.
+    Keyed by the SHA-256 of the PDF content plus EXTRACTOR_VERSION, so a parser
+    change invalidates old entries. The report date is taken from the filename,
+    so it is part of the key too.
+    Least recently used entries (by file mtime) are evicted once max_bytes is exceeded.
+    Frames with an error row are not stored: a failure (or a crashed worker) is retried
+    on the next request instead of being served from the cache.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        self._total_bytes = sum(size for _, _, size in self._entries())
+
+    def key(self, pdf_bytes, filename, digest=None):
+        date_match = re.search(r'202\d{5}', filename or '')
+        date_str = date_match.group(0) if date_match else "nodate"
+        return f"{digest or content_hash(pdf_bytes)}-{date_str}-v{EXTRACTOR_VERSION}"
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.parquet")
+
+    def _entries(self):
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith('.parquet'):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue  # evicted by another process
+            entries.append((st.st_mtime, path, st.st_size))
+        return entries
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            df = pd.read_parquet(path)
+            os.utime(path)  # mark as recently used
+        except (FileNotFoundError, OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        # Parquet does not keep every dtype (an all-null Zone comes back as object)
+        return schema.coerce(df)
+
+    def put(self, key, df):
+        if df is None or (df['Status'] == schema.STATUS_ERROR).any():
+            return
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        df.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, path)  # atomic, so readers never see a partial file
+        with self._lock:
+            self._total_bytes += os.path.getsize(path)
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        # Rescan: other processes may share the directory
+        entries = sorted(self._entries())
+        total = sum(size for _, _, size in entries)
+        for _, path, size in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            self.evictions += 1
+        self._total_bytes = total
+
+    def get_or_extract(self, pdf_bytes, filename, sink=None, digest=None, page_jobs=None):
+        """
+        pdf_bytes may also be a zero-argument callable returning the bytes; with a
+        precomputed `digest` (content_hash) it is only called on a miss.
+        page_jobs is passed on to extract_from_pdf.
+        """
+        if digest is None and callable(pdf_bytes):
+            pdf_bytes = pdf_bytes()
+        key = self.key(pdf_bytes, filename, digest)
+        record = ExtractionRecord(filename)
+        with record.stage('cache_read'):
+            df = self.get(key)
+        if df is None:
+            if callable(pdf_bytes):
+                pdf_bytes = pdf_bytes()
+            df = extract_from_pdf(io.BytesIO(pdf_bytes), filename=filename, sink=sink, page_jobs=page_jobs)
+            self.put(key, df)
+            return df
+
+        # Replace the stored record (timings of the original extraction) with this lookup
+        record.try_strategy('cache')
+        record.strategy = 'cache'
+        record.rows = len(df)
+        df.attrs['extraction'] = record.to_dict()
+        if sink is not None:
+            sink(record.to_dict())
+        return df
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'bytes': self._total_bytes,
+            }
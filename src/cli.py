@@ -0,0 +1,239 @@
+"""
+Batch command line over the extractor and aggregator, for cron / headless runs.
+
+    python -m src.cli REPORTS_DIR 'archive/2025-*/*.pdf' --jobs 8 \
+        --since 20250101 --until 20250331 --output q1.parquet --report q1.json
+
+Inputs are PDF files, directories (every *.pdf inside) or glob patterns. The date
+filter is applied to the date in the filename before anything is extracted, then
+to the extracted rows. --output writes the daily rows (.parquet / .csv) or, for
+.xlsx, the summary and the daily rows as two sheets; the weekly summary is printed
+unless --quiet. --report writes a JSON run report with per-file status and timings.
+Exit status is 1 if any file failed, 2 if there was nothing to process.
+"""
+import argparse
+import datetime
+import glob
+import json
+import os
+import re
+import sys
+import time
+
+import pandas as pd
+
+from src import schema
+from src.aggregator import calculate_weekly_summary
+from src.cache import DEFAULT_CACHE_DIR, ExtractionCache, content_hash
+from src.export import FORMATS, ReportExporter
+from src.extractor import iter_pdfs
+from src.store import HistoryStore
+
+SUMMARY_SHEET = '週次サマリー'
+DETAIL_SHEET = '日別詳細'
+
+
+def expand_inputs(inputs):
+    """
+    Files, directories and glob patterns -> sorted unique PDF paths. A file reached
+    through several inputs (or spellings of its path) is listed once.
+    """
+    paths = {}
+    for item in inputs:
+        if os.path.isdir(item):
+            matches = glob.glob(os.path.join(item, '*.pdf'))
+        elif os.path.isfile(item):
+            matches = [item]
+        else:
+            matches = [path for path in glob.glob(item, recursive=True) if os.path.isfile(path)]
+        for path in matches:
+            paths.setdefault(os.path.realpath(path), path)
+    return sorted(paths.values())
+
+
+def filename_date(path):
+    match = re.search(r'202\d{5}', os.path.basename(path))
+    return schema.parse_date(match.group(0)) if match else None
+
+
+def in_range(date, since, until):
+    if date is None or pd.isna(date):
+        # The extractor dates rows by the file name too, so an undated file's rows
+        # cannot be placed in a range: taken only when there is none
+        return since is None and until is None
+    return (since is None or date >= since) and (until is None or date <= until)
+
+
+def _parse_day(value):
+    date = schema.parse_date(value)
+    if pd.isna(date):
+        raise argparse.ArgumentTypeError(f"not a YYYYMMDD date: {value!r}")
+    return date
+
+
+def _output_format(path, fmt):
+    fmt = fmt or os.path.splitext(path)[1].lstrip('.').lower()
+    if fmt not in FORMATS:
+        raise SystemExit(f"Unknown output format {fmt!r} (choose from {', '.join(FORMATS)})")
+    return fmt
+
+
+def file_report(path, df, record, elapsed):
+    """
+    One entry of the run report. record is None for cache hits.
+    """
+    failed = df is None or df.empty or (df['Status'] == schema.STATUS_ERROR).any()
+    entry = {
+        'file': path,
+        'status': 'error' if failed else ('cached' if record is None else 'ok'),
+        'rows': 0 if df is None else int((df['Status'] == schema.STATUS_OK).sum()),
+        'dates': [] if df is None else sorted(schema.format_date(df['Date'].dropna().drop_duplicates()).tolist()),
+        'error': None,
+        'elapsed_seconds': round(elapsed, 6),
+        'strategy': None,
+        'page_count': None,
+        'pages_read': None,
+        'stages': {},
+    }
+    if failed and df is not None and not df.empty:
+        entry['error'] = '; '.join(df.loc[df['Status'] == schema.STATUS_ERROR, 'Error'].dropna().astype(str))
+    if record is not None:
+        entry['strategy'] = record['strategy']
+        entry['page_count'] = record.get('page_count')
+        entry['pages_read'] = record.get('pages_read')
+        entry['stages'] = record['stages']
+    return entry
+
+
+def run(pdf_files, jobs=1, cache=None, store=None, since=None, until=None):
+    """
+    Extracts pdf_files and returns (daily rows in input order, per-file report entries).
+    """
+    # Records carry only the file name; each one arrives right before its file's result
+    # (cache hits send none), so it is taken out as soon as that file is yielded
+    records = {}
+    def sink(record):
+        records[record['filename']] = record
+
+    results = {}
+    entries = {}
+    last = time.perf_counter()
+    for pdf_file, df in iter_pdfs(pdf_files, jobs=jobs, cache=cache, sink=sink):
+        now = time.perf_counter()
+        record = records.pop(os.path.basename(pdf_file), None)
+        # Wall time between results; the per-stage times in the record are the extraction itself
+        entries[pdf_file] = file_report(pdf_file, df, record, now - last)
+        last = now
+        results[pdf_file] = df
+        if store is not None:
+            with open(pdf_file, 'rb') as f:
+                store.add_rows(df, content_hash(f.read()))
+
+    daily_df = schema.concat(results[pdf_file] for pdf_file in pdf_files)
+    if since is not None or until is not None:
+        # Undated rows cannot be in the range; only error rows (failed files) stay visible
+        keep = daily_df['Date'].isna() & (daily_df['Status'] == schema.STATUS_ERROR)
+        keep |= daily_df['Date'].between(since or pd.Timestamp.min, until or pd.Timestamp.max)
+        daily_df = daily_df[keep].reset_index(drop=True)
+    return daily_df, [entries[pdf_file] for pdf_file in pdf_files]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Extract daily zone-sales PDFs and build the weekly summary.")
+    parser.add_argument('inputs', nargs='+', help="PDF files, directories or glob patterns")
+    parser.add_argument('--jobs', type=int, default=1, help="parallel extraction processes (0 = all cores)")
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR, help="extraction cache directory")
+    parser.add_argument('--no-cache', action='store_true', help="always extract, do not read or write the cache")
+    parser.add_argument('--since', type=_parse_day, help="first report date to include (YYYYMMDD)")
+    parser.add_argument('--until', type=_parse_day, help="last report date to include (YYYYMMDD)")
+    parser.add_argument('--output', help="write the daily rows to .parquet/.csv, or summary + rows to .xlsx")
+    parser.add_argument('--format', choices=list(FORMATS), help="output format (default: from the --output extension)")
+    parser.add_argument('--summary-output', help="also write the summary table (format from its extension)")
+    parser.add_argument('--report', help="write a JSON run report to this file")
+    parser.add_argument('--store', help="also add the rows to this history database (see src/store.py)")
+    parser.add_argument('--quiet', action='store_true', help="do not print the summary")
+    args = parser.parse_args(argv)
+
+    started = datetime.datetime.now()
+    start = time.perf_counter()
+
+    found = expand_inputs(args.inputs)
+    pdf_files = [path for path in found if in_range(filename_date(path), args.since, args.until)]
+    undated = [path for path in found if pd.isna(filename_date(path))]
+    if undated and (args.since is not None or args.until is not None):
+        print(f"WARNING: {len(undated)} files without a date in their name skipped by --since/--until",
+              file=sys.stderr)
+    if not pdf_files:
+        print("No PDF files to process.", file=sys.stderr)
+        return 2
+
+    cache = None if args.no_cache else ExtractionCache(args.cache_dir)
+    store = HistoryStore(args.store) if args.store else None
+
+    daily_df, files = run(pdf_files, jobs=args.jobs or None, cache=cache, store=store,
+                          since=args.since, until=args.until)
+    valid_df = daily_df[daily_df['Status'] == schema.STATUS_OK]
+    summary_df = calculate_weekly_summary(valid_df) if not valid_df.empty else pd.DataFrame()
+
+    exporter = ReportExporter()
+    sheets = {SUMMARY_SHEET: summary_df, DETAIL_SHEET: daily_df}
+    outputs = {}
+    if args.output:
+        fmt = _output_format(args.output, args.format)
+        with open(args.output, 'wb') as f:
+            f.write(exporter.export(sheets, fmt, None if fmt == 'xlsx' else DETAIL_SHEET))
+        outputs['output'] = args.output
+    if args.summary_output:
+        fmt = _output_format(args.summary_output, None)
+        with open(args.summary_output, 'wb') as f:
+            f.write(exporter.export({SUMMARY_SHEET: summary_df}, fmt))
+        outputs['summary_output'] = args.summary_output
+
+    failed = [entry for entry in files if entry['status'] == 'error']
+    # The same day from two files (e.g. a re-sent report) is counted twice in the summary
+    files_per_date = {}
+    for entry in files:
+        for date in entry['dates']:
+            files_per_date.setdefault(date, []).append(entry['file'])
+    duplicate_dates = {date: paths for date, paths in sorted(files_per_date.items()) if len(paths) > 1}
+    # Same file name in different directories: their rows cannot be told apart in the outputs
+    files_per_name = {}
+    for entry in files:
+        files_per_name.setdefault(os.path.basename(entry['file']), []).append(entry['file'])
+    duplicate_names = {name: paths for name, paths in sorted(files_per_name.items()) if len(paths) > 1}
+    if not args.quiet:
+        print(summary_df.to_string(index=False) if not summary_df.empty else "No valid rows.")
+    for entry in failed:
+        print(f"FAILED {entry['file']}: {entry['error']}", file=sys.stderr)
+    for date, paths in duplicate_dates.items():
+        print(f"WARNING: {date} is in {len(paths)} files: {', '.join(paths)}", file=sys.stderr)
+    for name, paths in duplicate_names.items():
+        print(f"WARNING: {len(paths)} inputs are named {name}: {', '.join(paths)}", file=sys.stderr)
+
+    if args.report:
+        report = {
+            'started': started.isoformat(timespec='seconds'),
+            'elapsed_seconds': round(time.perf_counter() - start, 3),
+            'jobs': args.jobs,
+            'since': args.since.strftime('%Y%m%d') if args.since is not None else None,
+            'until': args.until.strftime('%Y%m%d') if args.until is not None else None,
+            'files_found': len(found),
+            'files_processed': len(pdf_files),
+            'files_failed': len(failed),
+            'rows': int(len(valid_df)),
+            'dates': int(valid_df['Date'].nunique()),
+            'cache': cache.stats() if cache is not None else None,
+            'duplicate_dates': duplicate_dates,
+            'duplicate_names': duplicate_names,
+            'outputs': outputs,
+            'files': files,
+        }
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+            f.write('\n')
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
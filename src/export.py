@@ -0,0 +1,218 @@
+"""
+Report export (Excel, CSV, Parquet), built on demand and cached by data fingerprint.
+
+The Excel writer streams rows instead of going through pandas' openpyxl writer:
+xlsxwriter in constant-memory mode when it is installed, otherwise a small
+built-in SpreadsheetML writer. Dates are written in the 'YYYYMMDD' form used in the UI.
+"""
+import csv
+import hashlib
+import io
+import itertools
+import math
+import threading
+import zipfile
+from collections import OrderedDict
+from xml.sax.saxutils import escape
+
+import pandas as pd
+
+try:
+    import xlsxwriter
+except ImportError:  # optional, faster writer
+    xlsxwriter = None
+
+FORMATS = {
+    'xlsx': ('Excel', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+    'csv': ('CSV', 'text/csv'),
+    'parquet': ('Parquet', 'application/vnd.apache.parquet'),
+}
+
+MAX_CACHED = 8
+
+
+def fingerprint(sheets):
+    """
+    Content hash of {sheet name: DataFrame}; equal data gives an equal fingerprint.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for name, df in sheets.items():
+        digest.update(name.encode('utf-8'))
+        digest.update(repr([(str(col), str(dtype)) for col, dtype in df.dtypes.items()]).encode('utf-8'))
+        digest.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def _plain(df):
+    """
+    Column-wise conversion to plain Python values (dates as 'YYYYMMDD', NaN as None).
+    """
+    columns = []
+    for col in df.columns:
+        series = df[col]
+        if pd.api.types.is_datetime64_any_dtype(series):
+            series = series.dt.strftime('%Y%m%d')
+        elif isinstance(series.dtype, pd.CategoricalDtype):
+            series = series.astype(object)
+        elif series.dtype == 'float32':
+            # 98.7 rather than 98.69999694824219
+            series = pd.Series(series.to_numpy().astype(str), index=series.index).astype('float64')
+        values = series.astype(object).where(series.notna(), None)
+        columns.append(values.tolist())
+    return [str(col) for col in df.columns], zip(*columns)
+
+
+def _excel_xlsxwriter(sheets, buffer):
+    workbook = xlsxwriter.Workbook(buffer, {'constant_memory': True})
+    for name, df in sheets.items():
+        sheet = workbook.add_worksheet(name)
+        header, rows = _plain(df)
+        sheet.write_row(0, 0, header)
+        for i, row in enumerate(rows, start=1):
+            sheet.write_row(i, 0, row)
+    workbook.close()
+
+
+_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '{sheets}</Types>'
+)
+_SHEET_TYPE = (
+    '<Override PartName="/xl/worksheets/sheet{n}.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+)
+_ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Target="xl/workbook.xml" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"/>'
+    '</Relationships>'
+)
+_WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets>{sheets}</sheets></workbook>'
+)
+_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '{sheets}</Relationships>'
+)
+_SHEET_REL = (
+    '<Relationship Id="rId{n}" Target="worksheets/sheet{n}.xml" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet"/>'
+)
+
+
+def _cell(value):
+    if value is None or (isinstance(value, float) and not math.isfinite(value)):
+        return '<c/>'
+    if isinstance(value, (bool, str)) or not isinstance(value, (int, float)):
+        return f'<c t="inlineStr"><is><t>{escape(str(value))}</t></is></c>'
+    return f'<c><v>{value!r}</v></c>'
+
+
+def _excel_builtin(sheets, buffer):
+    # Plain SpreadsheetML with inline strings: no shared-string table, no styles,
+    # one pass over the rows per sheet.
+    names = list(sheets)
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED, compresslevel=1) as archive:
+        archive.writestr('[Content_Types].xml', _CONTENT_TYPES.format(
+            sheets=''.join(_SHEET_TYPE.format(n=n) for n in range(1, len(names) + 1))))
+        archive.writestr('_rels/.rels', _ROOT_RELS)
+        archive.writestr('xl/workbook.xml', _WORKBOOK.format(sheets=''.join(
+            f'<sheet name="{escape(name, {chr(34): "&quot;"})}" sheetId="{n}" r:id="rId{n}"/>'
+            for n, name in enumerate(names, start=1))))
+        archive.writestr('xl/_rels/workbook.xml.rels', _WORKBOOK_RELS.format(
+            sheets=''.join(_SHEET_REL.format(n=n) for n in range(1, len(names) + 1))))
+        for n, name in enumerate(names, start=1):
+            header, rows = _plain(sheets[name])
+            with archive.open(f'xl/worksheets/sheet{n}.xml', 'w') as part:
+                part.write(b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                           b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+                           b'<sheetData>')
+                for row in itertools.chain([header], rows):
+                    part.write(('<row>' + ''.join(map(_cell, row)) + '</row>').encode('utf-8'))
+                part.write(b'</sheetData></worksheet>')
+
+
+def to_excel(sheets):
+    buffer = io.BytesIO()
+    if xlsxwriter is not None:
+        _excel_xlsxwriter(sheets, buffer)
+    else:
+        _excel_builtin(sheets, buffer)
+    return buffer.getvalue()
+
+
+def to_csv(df):
+    # utf-8-sig so Excel opens the Japanese zone names correctly
+    header, rows = _plain(df)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    writer.writerow(header)
+    writer.writerows(rows)
+    return buffer.getvalue().encode('utf-8-sig')
+
+
+def to_parquet(df):
+    buffer = io.BytesIO()
+    df.to_parquet(buffer, index=False)
+    return buffer.getvalue()
+
+
+class ReportExporter:
+    """
+    Builds export files and keeps the last few by (fingerprint, format, sheet).
+
+    Thread-safe: Streamlit runs deferred download callables on a separate thread.
+    """
+
+    def __init__(self, max_cached=MAX_CACHED):
+        self.max_cached = max_cached
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def export(self, sheets, fmt, sheet=None):
+        """
+        sheets: {sheet name: DataFrame}. Excel gets every sheet; CSV and Parquet
+        hold one table, `sheet` (default: the first one).
+        """
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown export format: {fmt!r}")
+        if fmt != 'xlsx':
+            sheet = sheet or next(iter(sheets))
+            sheets = {sheet: sheets[sheet]}
+        key = (fingerprint(sheets), fmt)
+
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return self._cache[key]
+            self.misses += 1
+
+        if fmt == 'xlsx':
+            data = to_excel(sheets)
+        elif fmt == 'csv':
+            data = to_csv(sheets[sheet])
+        else:
+            data = to_parquet(sheets[sheet])
+
+        with self._lock:
+            self._cache[key] = data
+            while len(self._cache) > self.max_cached:
+                self._cache.popitem(last=False)
+        return data
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'entries': len(self._cache)}
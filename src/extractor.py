@@ -1,36 +1,41 @@
 import pdfplumber
 import os
 
-try:
-    import pytesseract
-    # Set Tesseract path for Windows
-    if os.name == 'nt':
-        tess_path = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
-        if os.path.exists(tess_path):
-            pytesseract.pytesseract.tesseract_cmd = tess_path
-    # On Linux (Streamlit Cloud), tesseract is usually in PATH, so no need to set cmd.
-except ImportError:
-    pytesseract = None
-    print("WARNING: pytesseract import failed.")
-
-if pytesseract:
-    print("DEBUG: pytesseract module loaded.")
-else:
-    print("DEBUG: pytesseract module NOT loaded.")
-
-
-
-
 import numpy as np
+from PIL import Image
 import warnings
+from src import ocr, schema
+from src.instrumentation import ExtractionRecord
+from src.layout import PageLayout
+from src.pdfium_text import page_table
+from src.preprocess import preprocess
+from src.render import PageRenderer
 
 # Suppress easyocr warnings
 warnings.filterwarnings("ignore", category=UserWarning)
 import pandas as pd
 import glob
+import hashlib
+import io
 import os
 import re
 
+# Bump whenever a change alters extracted rows, so cached results are invalidated
+EXTRACTOR_VERSION = "8"
+
+# Reading stops at the page holding this row (the last row of the report)
+FINAL_ROW_MARKER = '総合計'
+# Files with at least this many pages extract pages 2.. in a process pool
+PARALLEL_PAGES_MIN = 4
+MAX_PAGE_JOBS = 4
+
+# 'pdfium': try the pypdfium2 fast path on page 1 first (see src/pdfium_text.py);
+# 'pdfplumber': the pdfplumber/OCR strategy chain only. Either way pdfplumber is the fallback.
+TEXT_ENGINES = ('pdfium', 'pdfplumber')
+DEFAULT_TEXT_ENGINE = os.environ.get('WEEKLY_REPORT_TEXT_ENGINE', 'pdfium')
+# Header cells of the figure columns; a fast-path row needs a figure under one of them
+PDFIUM_NUMERIC_KEYS = ('純売上高', '前年比', '客数')
+
 def parse_num(val, zone_name="Unknown"):
     val_str = str(val).strip()
     # Handle negative indicators
@@ -79,16 +84,234 @@ def parse_float(val, zone_name="Unknown"):
              print(f"[WARNING] Could not parse float: '{val}' (Zone: {zone_name})")
         return 0.0
 
-def extract_from_pdf(pdf_file_obj, filename=None):
+# Plain decimal as float() accepts it; anything fancier goes through the scalar path
+_SIMPLE_NUM = r'[+-]?(?:[0-9]+\.?[0-9]*|\.[0-9]+)'
+
+def _parse_column(values, integer):
+    """
+    Shared core of parse_num_column / parse_float_column.
+    Mirrors parse_num / parse_float cell for cell, but with column-wide string operations.
+    """
+    s = pd.Series(['' if v is None else str(v) for v in values], dtype=object)
+    s = s.str.replace(',', '', regex=False).str.strip()
+
+    # Handle negative indicators
+    neg = s.str.contains('[△▲]', regex=True)
+    s = s.where(~neg, '-' + s.str.replace('[△▲]', '', regex=True))
+
+    values_out = np.zeros(len(s), dtype=np.float64)
+    parsed = np.zeros(len(s), dtype=bool)
+
+    # Explicit zero indicator
+    parsed |= (s == '-').to_numpy()
+
+    # Fast path: ordinary numbers
+    simple = s.str.fullmatch(_SIMPLE_NUM).to_numpy(dtype=bool) & ~parsed
+    values_out[simple] = s[simple].astype(np.float64).to_numpy()
+    parsed |= simple
+
+    # Doubled values like '0.0 0' (any whitespace): the first token wins
+    tokens = s.str.split()
+    first = tokens.str[0].fillna('')
+    doubled = (tokens.str.len() > 1).to_numpy(dtype=bool) & first.str.fullmatch(_SIMPLE_NUM).to_numpy(dtype=bool) & ~parsed
+    values_out[doubled] = first[doubled].astype(np.float64).to_numpy()
+    parsed |= doubled
+
+    # Rare leftovers ('1e3', full-width digits, 'nan', ...): exact scalar semantics
+    failed = np.zeros(len(s), dtype=bool)
+    convert = (lambda x: int(float(x))) if integer else float
+    for i in np.flatnonzero(~parsed):
+        val_str = s.iat[i]
+        candidates = [val_str]
+        parts = val_str.split()
+        if len(parts) > 1:
+            candidates.append(parts[0])
+        for cand in candidates:
+            try:
+                values_out[i] = convert(cand)
+                break
+            except (ValueError, TypeError, OverflowError):
+                continue
+        else:
+            failed[i] = val_str not in ['', 'nan', 'None']
+
+    if integer:
+        # Beyond int64 is never a real figure; report it instead of wrapping around
+        overflow = np.abs(values_out) >= 2.0 ** 63
+        values_out[overflow] = 0
+        failed |= overflow
+        return np.trunc(values_out).astype(np.int64), failed
+    return values_out, failed
+
+def parse_num_column(values):
+    """
+    Column version of parse_num for raw table cells (None, commas and △/▲ negatives allowed).
+    Returns (int64 array, failed mask); failed cells are 0, as parse_num would return.
+    Values outside the int64 range are treated as failed.
+    """
+    return _parse_column(values, integer=True)
+
+def parse_float_column(values):
+    """
+    Column version of parse_float. Returns (float64 array, failed mask).
+    """
+    return _parse_column(values, integer=False)
+
+# Orientation probe: the render scaled to ~150dpi, top 40% of the page (where the header sits)
+OCR_PROBE_DPI = 150
+OCR_PROBE_SCALE = 0.5
+OCR_PROBE_HEIGHT = 0.4
+# Words that place the table header line in the probe (the title also says 売上)
+OCR_HEADER_KEYS = ['純売上高', 'ブロック', '業種']
+# Table crop for the full-resolution OCR pass, measured on the probe at 1/4 of the OCR
+# resolution (75dpi):
+# a row is ink if more than OCR_INK_MIN of it is dark; the table ends at the first
+# blank band taller than OCR_GAP of the page height; OCR_PAD of the page is kept around it
+OCR_REDUCE = 4
+OCR_INK_MIN = 0.005
+OCR_GAP = 0.03
+OCR_PAD = 0.01
+
+# Until the table header is found, any OCR'd line holding one of these is taken as the
+# header; after it, only a line with all of OCR_REPEAT_HEADER_KEYS (the header printed
+# again on a later page) is, since zone names may hold a header word (【Ａブロック】...)
+OCR_HEADER_LINE_KEYS = ['純売上高', '売上', 'ブロック']
+OCR_REPEAT_HEADER_KEYS = ['純売上高', '客数']
+
+def is_ocr_header_line(line, header_found=False):
+    """
+    True if the OCR parser reads line (spaces ignored) as the header instead of a row.
+    """
+    clean_line = line.replace(" ", "")
+    if header_found:
+        return all(key in clean_line for key in OCR_REPEAT_HEADER_KEYS)
+    return any(key in clean_line for key in OCR_HEADER_LINE_KEYS)
+
+def _has_ocr_header(text):
+    # Check if it looks valid using clean text (ignoring spaces)
+    clean_text = text.replace(" ", "").replace("\n", "")
+    return any(key in clean_text for key in ['純売上高', '売上', 'Sales', 'ブロック', '業種'])
+
+def _ocr_lines(probe, ocr_engine):
+    # (text, top) per line of probe, in reading order, from one Tesseract pass
+    data = ocr_engine.image_to_data(probe)
+    lines = {}
+    for i, word in enumerate(data['text']):
+        word = word.strip()
+        if not word:
+            continue
+        key = (data['block_num'][i], data['par_num'][i], data['line_num'][i])
+        text, top = lines.get(key, ('', data['top'][i]))
+        lines[key] = (text + word, min(top, data['top'][i]))
+    return list(lines.values())
+
+def locate_header(img, ocr_engine=None, scale=OCR_PROBE_SCALE):
+    """
+    Finds the rotation (PIL angle, counter-clockwise) that puts a scanned page upright,
+    and where the table header line starts on the upright full-size page.
+    Tesseract OSD picks the first candidate; each candidate is confirmed by OCRing only
+    the header strip of a downscaled grayscale copy.
+    Returns (angle, header top in pixels); (angle, None) if the header line itself
+    was not placed, (None, None) if no angle matched.
+    ocr_engine defaults to the shared engine (src.ocr.get_engine()); scale is the
+    probe size relative to img.
+    """
+    ocr_engine = ocr_engine or ocr.get_engine()
+    if ocr_engine is None:
+        return None, None
+
+    small = img.convert('L')
+    if scale != 1:
+        small = small.resize((max(1, int(img.width * scale)), max(1, int(img.height * scale))))
+
+    candidates = [0, 180, 90, 270]
+    try:
+        osd = ocr_engine.image_to_osd(small)
+        # OSD reports the clockwise correction; PIL rotates counter-clockwise
+        osd_angle = (360 - int(osd['rotate'])) % 360
+        candidates.remove(osd_angle)
+        candidates.insert(0, osd_angle)
+    except Exception as e:
+        # osd.traineddata missing, or too little text for OSD
+        print(f"DEBUG: OSD unavailable ({e}). Probing all orientations.")
+
+    for angle in candidates:
+        probe = small if angle == 0 else small.rotate(angle, expand=True)
+        probe = probe.crop((0, 0, probe.width, max(1, int(probe.height * OCR_PROBE_HEIGHT))))
+        lines = _ocr_lines(probe, ocr_engine)
+        if _has_ocr_header(''.join(text for text, top in lines)):
+            for text, top in lines:
+                if any(key in text for key in OCR_HEADER_KEYS):
+                    return angle, int(top / scale)
+            return angle, None
+    return None, None
+
+def detect_orientation(img, ocr_engine=None):
+    """
+    Rotation that puts a scanned page upright (see locate_header), or None.
+    """
+    return locate_header(img, ocr_engine)[0]
+
+def ocr_table_box(gray, header_top, reduce=OCR_REDUCE):
+    """
+    Box (left, top, right, bottom) of the table on an upright grayscale page, from the
+    ink profile below header_top: down to the first wide blank band (the footer notes
+    are set apart from the table), across the ink of those rows. None if nothing to crop.
+    The profile is measured on a copy 1/reduce the size.
+    """
+    small = np.asarray(gray.reduce(reduce) if reduce > 1 else gray) < 128
+    height, width = small.shape
+    pad_y, pad_x = max(1, int(height * OCR_PAD)), max(1, int(width * OCR_PAD))
+    top = max(0, header_top // reduce - pad_y)
+    inked = small[top:].mean(axis=1) > OCR_INK_MIN
+    rows = np.flatnonzero(inked)
+    if not len(rows):
+        return None
+    # Blank bands between ink rows; the table stops before the first one taller than OCR_GAP
+    gaps = np.flatnonzero(np.diff(rows) > height * OCR_GAP)
+    last = rows[gaps[0]] if len(gaps) else rows[-1]
+    bottom = min(height, top + last + 1 + pad_y)
+    cols = np.flatnonzero(small[top:bottom].mean(axis=0) > OCR_INK_MIN)
+    left, right = max(0, cols[0] - pad_x), min(width, cols[-1] + 1 + pad_x)
+    box = tuple(int(v) * reduce for v in (left, top, right, bottom))
+    box = (box[0], box[1], min(gray.width, box[2]), min(gray.height, box[3]))
+    if box == (0, 0, gray.width, gray.height):
+        return None
+    return box
+
+def extract_from_pdf(pdf_file_obj, filename=None, sink=None, page_jobs=None, engine=None):
     """
     Extracts data from a PDF file object (or path).
     Tries default extraction first (best for valid tables), then falls back to text strategy.
+    Pages are read in order until the one holding the 総合計 row; each row records its Page.
+    Files with PARALLEL_PAGES_MIN pages or more extract pages 2.. in a process pool of
+    page_jobs workers (None: up to MAX_PAGE_JOBS; 1: always serial).
+    engine (one of TEXT_ENGINES, default DEFAULT_TEXT_ENGINE) selects whether the
+    pdfium fast path is tried before the pdfplumber strategies.
+    A structured timing record (see src.instrumentation) is stored in df.attrs['extraction']
+    and, if given, passed to sink (any callable, e.g. JsonLinesSink).
     """
     if filename is None:
         filename = "Unknown"
         if isinstance(pdf_file_obj, str):
             filename = os.path.basename(pdf_file_obj)
 
+    engine = engine or DEFAULT_TEXT_ENGINE
+    if engine not in TEXT_ENGINES:
+        raise ValueError(f"Unknown text engine: {engine!r}")
+
+    record = ExtractionRecord(filename)
+    with record.stage('total'):
+        result = _extract_from_pdf(pdf_file_obj, filename, record, page_jobs, engine)
+
+    if result is not None:
+        record.rows = len(result)
+        result.attrs['extraction'] = record.to_dict()
+    if sink is not None:
+        sink(record.to_dict())
+    return result
+
+def _extract_from_pdf(pdf_file_obj, filename, record, page_jobs=None, engine='pdfplumber'):
     print(f"Processing {filename}...")
     
     # Extract date from filename (e.g., 20260126)
@@ -99,402 +322,762 @@ def extract_from_pdf(pdf_file_obj, filename=None):
         date_str = "Unknown"
 
     data = []
-    
+    ocr_angle = None
+
+    if engine == 'pdfium':
+        record.try_strategy('pdfium')
+        with record.stage('pdfium'):
+            rows = _extract_pdfium(pdf_file_obj, filename, date_str, record)
+        if rows:
+            record.strategy = 'pdfium'
+            result = schema.extracted_frame(rows)
+            result.attrs['page_count'] = record.page_count
+            return result
+
     try:
         with pdfplumber.open(pdf_file_obj) as pdf:
             if not pdf.pages:
                 print(f"No pages in {filename}")
                 return None
-                 
-            page = pdf.pages[0]
+
+            record.page_count = len(pdf.pages)
+            first = pdf.pages[0]
+            record.page_width, record.page_height = float(first.width), float(first.height)
+            record.char_count = 0
+
+            # Carried from page to page: column map and whether rows have started,
+            # for continuation pages that do not repeat the header
+            context = {}
+            results = []
+            parallel = _parallel_pages(record.page_count, page_jobs)
+            for page in pdf.pages:
+                results.append(_extract_page(page, page.page_number, filename, date_str, record, context))
+                page.close()  # drop the page's parsed objects before the next one
+                # A long file reads page 1 here (it sets the column map), the rest in the pool
+                if _has_final_row(results[-1]['rows']) or parallel:
+                    break
+            if parallel and not _has_final_row(results[-1]['rows']):
+                results.extend(_extract_pages_parallel(
+                    pdf_file_obj, range(2, record.page_count + 1), filename, date_str, record, context, page_jobs))
+
+            record.pages_read = len(results)
+            for result in results:
+                record.char_count += result['chars']
+                record.ocr_pixels += result['ocr_pixels']
+                for name in result['tried']:
+                    if name not in record.strategies_tried:
+                        record.try_strategy(name)
+                for row in result['rows']:
+                    data.append(dict(row, Page=result['page']))
+                if result['rows'] and record.strategy is None:
+                    record.strategy = result['strategy']
+                if result['ocr_angle'] is not None and ocr_angle is None:
+                    ocr_angle = record.ocr_angle = result['ocr_angle']
+
+            # --- FINAL FALLBACK: Prevent App Error ---
+            if not data:
+                print(f"WARNING: Completely failed to extract data from {filename} (likely Image/Vector PDF). Returning placeholder.")
+                record.strategy = 'placeholder'
+                # Return a specific error marker (Status == 'error') so app.py can detect it
+                return schema.error_frame(date_str, f"{filename}: no data extracted")
+
+            result = schema.extracted_frame(data)
+            result.attrs['page_count'] = record.page_count
+            if ocr_angle is not None:
+                # Kept on the frame so callers can see how often scans arrive rotated
+                result.attrs['ocr_angle'] = ocr_angle
+            return result
+
+    except Exception as e:
+        print(f"Error processing {filename}: {e}")
+        record.error = str(e)
+        # Return placeholder on exception too
+        return schema.error_frame(date_str if 'date_str' in locals() else "Unknown", f"{filename}: {e}")
+
+def _extract_pdfium(pdf_file_obj, filename, date_str, record):
+    """
+    Fast path: page 1 through src.pdfium_text, parsed like a pdfplumber table.
+    Returns the rows (with Page) only if they make a complete report: header found,
+    every row has figures and every number parsed, and the 総合計 row present.
+    Otherwise returns None and the pdfplumber strategies run.
+    """
+    if isinstance(pdf_file_obj, (str, os.PathLike)):
+        source = pdf_file_obj
+    else:
+        pdf_file_obj.seek(0)
+        source = pdf_file_obj.read()
+        pdf_file_obj.seek(0)  # pdfplumber reads it again on fallback
+    try:
+        table, info = page_table(source)
+    except Exception as e:
+        print(f"pdfium fast path failed for {filename}: {e}")
+        return None
+
+    record.page_count = info['page_count']
+    record.page_width, record.page_height = info['width'], info['height']
+    record.char_count = info['chars']
+    if table is None:
+        return None
+    # A line without a single figure (a note or stamp inside the table area) is not
+    # a zone row; empty cells would parse as 0, so leave such pages to pdfplumber
+    numeric = [i for i, cell in enumerate(table[0]) if cell and any(key in cell for key in PDFIUM_NUMERIC_KEYS)]
+    if any(not any(row[i] for i in numeric) for row in table[1:]):
+        print(f"pdfium fast path found a row without figures in {filename}. Falling back to pdfplumber.")
+        return None
+    rows, unparsed = _parse_table(table, filename, 1, date_str, {})
+    if not rows or unparsed or not _has_final_row(rows):
+        print(f"pdfium fast path incomplete for {filename}. Falling back to pdfplumber.")
+        return None
+    record.pages_read = 1
+    return [dict(row, Page=1) for row in rows]
+
+def _has_final_row(rows):
+    return any(FINAL_ROW_MARKER in str(row['Zone']) for row in rows)
+
+def _parallel_pages(page_count, page_jobs):
+    if page_jobs is None:
+        page_jobs = min(os.cpu_count() or 1, MAX_PAGE_JOBS)
+    return page_jobs > 1 and page_count >= PARALLEL_PAGES_MIN
+
+def _extract_pages_parallel(pdf_file_obj, page_numbers, filename, date_str, record, context, page_jobs):
+    """
+    Extracts the remaining pages of a long file in a process pool, one wave of
+    page_jobs pages at a time, stopping after the wave that holds the final row.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    if page_jobs is None:
+        page_jobs = min(os.cpu_count() or 1, MAX_PAGE_JOBS)
+    if isinstance(pdf_file_obj, (str, os.PathLike)):
+        source = pdf_file_obj
+    else:
+        pdf_file_obj.seek(0)
+        source = pdf_file_obj.read()
+
+    page_numbers = list(page_numbers)
+    results = []
+    workers = min(page_jobs, len(page_numbers))
+    # The workers share this process's OCR memory budget (see src/ocr.py)
+    with ProcessPoolExecutor(max_workers=workers, initializer=ocr.init_pool_worker,
+                             initargs=(workers,)) as executor:
+        for start in range(0, len(page_numbers), page_jobs):
+            wave = page_numbers[start:start + page_jobs]
+            futures = [executor.submit(_extract_page_worker, source, n, filename, date_str, dict(context))
+                       for n in wave]
+            for future in futures:
+                result, stages = future.result()
+                for name, seconds in stages.items():
+                    record.stages[name] = record.stages.get(name, 0.0) + seconds
+                results.append(result)
+            if any(_has_final_row(result['rows']) for result in results[-len(wave):]):
+                # Later pages in the same wave were extracted anyway; the final row ends the report
+                for i, result in enumerate(results):
+                    if _has_final_row(result['rows']):
+                        return results[:i + 1]
+    return results
+
+def _extract_page_worker(source, page_number, filename, date_str, context):
+    # Process-pool entry point for one page; returns the page result and its stage timings
+    record = ExtractionRecord(filename)
+    pdf_file_obj = source if isinstance(source, (str, os.PathLike)) else io.BytesIO(source)
+    with pdfplumber.open(pdf_file_obj, pages=[page_number]) as pdf:
+        result = _extract_page(pdf.pages[0], page_number, filename, date_str, record, context)
+    return result, record.stages
+
+def _parse_table(table, filename, page_number, date_str, context):
+    """
+    Zone rows of an extracted table (rows of cell strings): finds the 純売上高 header
+    row, maps the columns from it (or from context['col_map'] on a continuation page)
+    and parses the rows below it. Returns (rows, number of numeric cells that did not parse).
+    """
+    data = []
+    unparsed = 0
+    print(f"Table extracted from {filename}. Searching for Header '純売上高'...")
+    header_row_idx = -1
+    col_map = {}
+
+    # 1. Find the Header Row (Anchor)
+    for i, row in enumerate(table):
+        row_text = [str(x).replace('\n', '') if x is not None else '' for x in row]
+        row_str = "".join(row_text)
+    
+        # Search for key header
+        if '純売上高' in row_text or '純売上高' in row_str:
+            header_row_idx = i
+            print(f"Header found at row {i} in {filename}")
+        
+            # Dynamic Column Mapping
+            try:
+                for idx, col in enumerate(row_text):
+                    if '純売上高' in col and 'Sales' not in col_map:
+                        col_map['Sales'] = idx
+                    if '客数' in col and 'Count' not in col_map:
+                        col_map['Count'] = idx
             
-            # --- STRATEGY 1: Default (Lines) - BEST for standard tables ---
-            # Most files work best with this.
-            table = page.extract_table()
+                # Fallbacks
+                if 'Sales' not in col_map: col_map['Sales'] = 2
+                if 'Count' not in col_map: col_map['Count'] = 4
+                col_map['Sales_YoY'] = col_map['Sales'] + 1
+                col_map['Count_YoY'] = col_map['Count'] + 1
             
-            # --- STRATEGY 2: Text-based - Fallback for broken lines ---
-            if not table:
-                print(f"Default extraction failed for {filename}. Trying text strategy...")
-                table = page.extract_table(table_settings={
-                    "vertical_strategy": "text", 
-                    "horizontal_strategy": "text",
-                    "intersection_y_tolerance": 10
-                })
+            except Exception:
+                col_map = {'Sales': 2, 'Sales_YoY': 3, 'Count': 4, 'Count_YoY': 5}
+            break
 
-            # Process the table (common logic)
-            if table:
-                print(f"Table extracted from {filename}. Searching for Header '純売上高'...")
-                header_row_idx = -1
-                col_map = {}
-                
-                # 1. Find the Header Row (Anchor)
-                for i, row in enumerate(table):
-                    row_text = [str(x).replace('\n', '') if x is not None else '' for x in row]
-                    row_str = "".join(row_text)
-                    
-                    # Search for key header
-                    if '純売上高' in row_text or '純売上高' in row_str:
-                        header_row_idx = i
-                        print(f"Header found at row {i} in {filename}")
-                        
-                        # Dynamic Column Mapping
-                        try:
-                            for idx, col in enumerate(row_text):
-                                if '純売上高' in col and 'Sales' not in col_map:
-                                    col_map['Sales'] = idx
-                                if '客数' in col and 'Count' not in col_map:
-                                    col_map['Count'] = idx
-                            
-                            # Fallbacks
-                            if 'Sales' not in col_map: col_map['Sales'] = 2
-                            if 'Count' not in col_map: col_map['Count'] = 4
-                            col_map['Sales_YoY'] = col_map['Sales'] + 1
-                            col_map['Count_YoY'] = col_map['Count'] + 1
-                            
-                        except Exception:
-                            col_map = {'Sales': 2, 'Sales_YoY': 3, 'Count': 4, 'Count_YoY': 5}
-                        break
-                
-                if header_row_idx == -1:
-                    print(f"WARNING: Header '純売上高' not found in Table of {filename}. skipping.")
-                else:
-                    # 2. Extract Data Rows
-                    for i, row in enumerate(table):
-                        if i <= header_row_idx: continue
-                        
-                        row = [str(x).replace(',', '').replace('None', '') if x is not None else '' for x in row]
-                        
-                        # Basic validation
-                        if len(row) < 3: continue
-                        zone_name = row[0]
-                        
-                        # Skip garbage & duplicates
-                        if not zone_name or zone_name in ['ブロック／業種', 'nan', 'None', ''] or '純売上高' in zone_name: continue
-                        if 'SHO00200' in str(row): continue 
-                        if '店別選択' in str(row): continue
-                        
-                        # Fix for Duplicate "Total" Rows:
-                        # "准合計" (Jun-Gokei) often appears right before "軽井沢PSP計" with same numbers.
-                        # Exclude it.
-                        if '准合計' in zone_name: continue
+    if header_row_idx == -1 and context.get('col_map'):
+        # Continuation page without a repeated header: same columns as the page before
+        print(f"No header on page {page_number} of {filename}. Using the previous page's columns.")
+        col_map = context['col_map']
+    elif header_row_idx != -1:
+        context['col_map'] = col_map
 
-                        try:
-                            sales_idx = col_map.get('Sales', 2)
-                            count_idx = col_map.get('Count', 4)
-                            
-                            if sales_idx >= len(row) or count_idx >= len(row): continue
+    if not col_map:
+        print(f"WARNING: Header '純売上高' not found in Table of {filename}. skipping.")
+    else:
+        # 2. Extract Data Rows
+        candidates = []
+        for i, row in enumerate(table):
+            if i <= header_row_idx: continue
+        
+            row = [str(x).replace(',', '').replace('None', '') if x is not None else '' for x in row]
+        
+            # Basic validation
+            if len(row) < 3: continue
+            zone_name = row[0]
+        
+            # Skip garbage & duplicates
+            if not zone_name or zone_name in ['ブロック／業種', 'nan', 'None', ''] or '純売上高' in zone_name: continue
+            if 'SHO00200' in str(row): continue 
+            if '店別選択' in str(row): continue
+        
+            # Fix for Duplicate "Total" Rows:
+            # "准合計" (Jun-Gokei) often appears right before "軽井沢PSP計" with same numbers.
+            # Exclude it.
+            if '准合計' in zone_name: continue
+
+            sales_idx = col_map.get('Sales', 2)
+            count_idx = col_map.get('Count', 4)
+        
+            if sales_idx >= len(row) or count_idx >= len(row): continue
+            if zone_name == "Unknown": continue
 
-                            sales = parse_num(row[sales_idx], zone_name)
+            # Missing YoY cells parse to 0.0, same as the scalar path
+            candidates.append((
+                zone_name, row[sales_idx], row[count_idx],
+                row[col_map['Sales_YoY']] if col_map.get('Sales_YoY') < len(row) else '',
+                row[col_map['Count_YoY']] if col_map.get('Count_YoY') < len(row) else ''
+            ))
 
+        # 3. Parse the numeric columns in one pass
+        if candidates:
+            zones, sales_raw, count_raw, sales_yoy_raw, count_yoy_raw = zip(*candidates)
+            sales, sales_bad = parse_num_column(sales_raw)
+            count, count_bad = parse_num_column(count_raw)
+            sales_yoy, sales_yoy_bad = parse_float_column(sales_yoy_raw)
+            count_yoy, count_yoy_bad = parse_float_column(count_yoy_raw)
 
-                            count = parse_num(row[count_idx], zone_name)
+            for raw, bad in [(sales_raw, sales_bad), (count_raw, count_bad),
+                             (sales_yoy_raw, sales_yoy_bad), (count_yoy_raw, count_yoy_bad)]:
+                unparsed += int(bad.sum())
+                for j in np.flatnonzero(bad):
+                    print(f"[WARNING] Could not parse number: '{raw[j]}' (Zone: {zones[j]})")
+
+            for j, zone_name in enumerate(zones):
+                data.append({
+                    'Date': date_str, 'Zone': zone_name,
+                    'Sales': int(sales[j]), 'Sales_YoY': float(sales_yoy[j]),
+                    'Count': int(count[j]), 'Count_YoY': float(count_yoy[j])
+                })
+    return data, unparsed
+
+def _extract_page(page, page_number, filename, date_str, record, context):
+    """
+    Runs the strategy chain (lines table, text table, raw text, OCR) on one page.
+    Returns {'page', 'rows', 'strategy', 'tried', 'ocr_angle', 'ocr_pixels', 'chars'}; stage timings go to record.
+    """
+    data = []
+    tried = []
+    strategy = None
+    ocr_angle = None
+    ocr_pixels = 0
+    # Chars, edges and words are computed once and shared by the text-layer strategies
+    layout = PageLayout(page, record)
+    with record.stage('layout'):
+        char_count = len(layout.chars)
+        # Only the zone table (header row to total row) goes to the strategies;
+        # the report title and footer boxes are left out
+        region = layout.table_region()
+        if region is not None:
+            layout = layout.crop(region)
+
+    # --- STRATEGY 1: Default (Lines) - BEST for standard tables ---
+    # Most files work best with this.
+    tried.append('table_lines')
+    with record.stage('extract_table'):
+        table = layout.extract_table()
+    table_strategy = 'table_lines'
+    
+    # --- STRATEGY 2: Text-based - Fallback for broken lines ---
+    if not table:
+        print(f"Default extraction failed for {filename}. Trying text strategy...")
+        tried.append('table_text')
+        with record.stage('extract_table_text'):
+            table = layout.extract_table(table_settings={
+                "vertical_strategy": "text", 
+                "horizontal_strategy": "text",
+                "intersection_y_tolerance": 10
+            })
+        table_strategy = 'table_text'
+
+    # Process the table (common logic)
+    if table:
+        with record.stage('parse_table'):
+            data, _ = _parse_table(table, filename, page_number, date_str, context)
+    if data:
+        strategy = table_strategy
+
+    # --- TEXT FALLBACK (Only if table method yielded no data) ---
+    if not data:
+        print(f"Table extraction yielded no data for {filename}. Trying RAW TEXT fallback...")
+        tried.append('raw_text')
+        with record.stage('extract_text'):
+            text = layout.extract_text()
+        if text:
+            lines = text.split('\n')
+            header_found_in_text = context.get('continued', False)
+            
+            for line in lines:
+                # Find header first to start "listening"
+                if '純売上高' in line and '客数' in line:
+                    header_found_in_text = True
+                    continue
+                
+                # Only parse if we have seen the header OR if the line looks like data (heuristic)
+                if header_found_in_text:
+                    parts = line.split()
+                    # Heuristic: Valid data line usually has: ZoneName Number Number ...
+                    if len(parts) >= 5:
+                        try:
+                            # Attempt to parse from the end of the line (usually safer)
+                            # Expected: [Zone] ... [Sales] [SalesYoY] [Count] [CountYoY]
+                            c_yoy = parse_float(parts[-1])
+                            cnt = parse_num(parts[-2])
+                            s_yoy = parse_float(parts[-3])
+                            sls = parse_num(parts[-4])
                             
-                            sales_yoy = 0.0
-                            if col_map.get('Sales_YoY') < len(row):
-                                sales_yoy = parse_float(row[col_map['Sales_YoY']], zone_name)
-                                
-                            count_yoy = 0.0
-                            if col_map.get('Count_YoY') < len(row):
-                                count_yoy = parse_float(row[col_map['Count_YoY']], zone_name)
+                            # Zone is whatever is left at the start
+                            zn = parts[0] 
                             
-                            if zone_name and zone_name != "Unknown":
+                            if sls > 0 or cnt > 0: # Only add if it looks like real data
                                 data.append({
-                                    'Date': date_str, 'Zone': zone_name,
-                                    'Sales': sales, 'Sales_YoY': sales_yoy,
-                                    'Count': count, 'Count_YoY': count_yoy
+                                    'Date': date_str, 'Zone': zn,
+                                    'Sales': sls, 'Sales_YoY': s_yoy,
+                                    'Count': cnt, 'Count_YoY': c_yoy
                                 })
-                        except Exception: continue
-                            
-            # --- TEXT FALLBACK (Only if table method yielded no data) ---
-            if not data:
-                print(f"Table extraction yielded no data for {filename}. Trying RAW TEXT fallback...")
-                text = page.extract_text()
-                if text:
-                    lines = text.split('\n')
-                    header_found_in_text = False
-                    
-                    for line in lines:
-                        # Find header first to start "listening"
-                        if '純売上高' in line and '客数' in line:
-                            header_found_in_text = True
-                            continue
-                        
-                        # Only parse if we have seen the header OR if the line looks like data (heuristic)
-                        if header_found_in_text:
-                            parts = line.split()
-                            # Heuristic: Valid data line usually has: ZoneName Number Number ...
-                            if len(parts) >= 5:
-                                try:
-                                    # Attempt to parse from the end of the line (usually safer)
-                                    # Expected: [Zone] ... [Sales] [SalesYoY] [Count] [CountYoY]
-                                    c_yoy = parse_float(parts[-1])
-                                    cnt = parse_num(parts[-2])
-                                    s_yoy = parse_float(parts[-3])
-                                    sls = parse_num(parts[-4])
-                                    
-                                    # Zone is whatever is left at the start
-                                    zn = parts[0] 
-                                    
-                                    if sls > 0 or cnt > 0: # Only add if it looks like real data
-                                        data.append({
-                                            'Date': date_str, 'Zone': zn,
-                                            'Sales': sls, 'Sales_YoY': s_yoy,
-                                            'Count': cnt, 'Count_YoY': c_yoy
-                                        })
-                                except:
-                                    pass
+                        except:
+                            pass
 
-            # --- STRATEGY 3: OCR Fallback (Image/Scan) ---
-            if not data:
-                print(f"Text extraction failed for {filename}. Trying OCR strategy...")
+        if data:
+            strategy = 'raw_text'
+
+    # --- STRATEGY 3: OCR Fallback (Image/Scan) ---
+    # Later pages with a text layer (notes, signatures) are not worth a 300dpi OCR pass
+    if not data and (page_number == 1 or char_count == 0):
+        print(f"Text extraction failed for {filename}. Trying OCR strategy...")
+        tried.append('ocr')
+        # Rendered pages are admitted against the process-wide OCR memory budget;
+        # resolution=300 is standard for OCR, lower if the budget stays tight (see src/ocr.py)
+        scheduler = ocr.get_scheduler()
+        with record.stage('ocr_wait'):
+            slot = scheduler.acquire(page.width, page.height)
+        if slot.dpi != ocr.OCR_DPIS[0]:
+            print(f"DEBUG: OCR memory budget tight; rendering {filename} at {slot.dpi}dpi.")
+        renderer = img = rotated_img = None
+        try:
+            # Grayscale renders straight from pdfium (see src/render.py): a 150dpi probe
+            # first; the OCR resolution only for the table, already turned upright
+            probe_dpi = min(OCR_PROBE_DPI, slot.dpi)
+            with record.stage('rasterize'):
+                renderer = PageRenderer.for_page(page)
+                img = Image.fromarray(renderer.render(probe_dpi))
+            
+            ocr_text = ""
+            
+            
+            # Method A: Tesseract (Preferred if available)
+            # The shared engine keeps initialized Tesseract workers (see src/ocr.py)
+            ocr_engine = ocr.get_engine()
+            if ocr_engine is not None:
                 try:
-                    # Convert page to image
-                    # resolution=300 is standard for OCR
-                    img = page.to_image(resolution=300).original
+                    # Tesseract needs 'jpn' data. If not found, it might error or default to eng.
+                    # We assume user might have it or we try.
                     
-                    ocr_text = ""
+                    # Find the orientation on a cheap downscaled probe first,
+                    # so only one full-resolution OCR pass is needed.
+                    # Also often PDFs are landscape but processed as portrait.
+                     
+                    valid_ocr_text = None
+                    angles = [0, 180, 90, 270]
                     
+                    with record.stage('ocr_orientation'):
+                        detected_angle, header_top = locate_header(img, ocr_engine, 1.0)
+                    attempts = [(angle, None) for angle in angles]
+                    if detected_angle is not None:
+                        print(f"DEBUG: Detected page orientation {detected_angle}.")
+                        angles.remove(detected_angle)
+                        attempts = [(detected_angle, None)] + [(angle, None) for angle in angles]
+                        if header_top is not None:
+                            # Only the table goes through the full-resolution pass; the whole
+                            # page is the fallback if the crop loses the header
+                            attempts.insert(0, (detected_angle, header_top))
                     
-                    # Method A: Tesseract (Preferred if available)
-                    if pytesseract:
-                        try:
-                            # Tesseract needs 'jpn' data. If not found, it might error or default to eng.
-                            # We assume user might have it or we try.
-                            # Use custom tessdata path if in project root (mainly for local Windows dev)
-                            local_tessdata = os.path.join(os.getcwd(), 'tessdata')
-                            if os.path.exists(local_tessdata) and os.name == 'nt':
-                                os.environ['TESSDATA_PREFIX'] = local_tessdata
-                            
-                            # On Linux/Cloud, we rely on apt-installed tessdata
-                            
-                            # Rotation strategy: 180 first (common issue), then 0, then 90, 270
-                            # Also often PDFs are landscape but processed as portrait.
-                             
-                            valid_ocr_text = None
-                            
-                            for angle in [0, 180, 90, 270]:
-                                print(f"DEBUG: Trying OCR with rotation {angle}...")
-                                if angle == 0:
-                                    rotated_img = img
-                                else:
-                                    rotated_img = img.rotate(angle, expand=True) # expand=True to keep full image
-                                    
-                                temp_text = pytesseract.image_to_string(rotated_img, lang='jpn')
-                                # print(f"DEBUG: Rotation {angle} text preview: {repr(temp_text[:200])}")
-                                
-                                # Check if it looks valid using clean text (ignoring spaces)
-                                clean_temp = temp_text.replace(" ", "").replace("\n", "")
-                                
-                                if '純売上高' in clean_temp or '売上' in clean_temp or 'Sales' in clean_temp or 'ブロック' in clean_temp or '業種' in clean_temp:
-                                    # print(f"DEBUG: Found valid headers at angle {angle}")
-                                    valid_ocr_text = temp_text
-                                    break
-                            
-                            if valid_ocr_text:
-                                ocr_text = valid_ocr_text
-                                print("OCR (Tesseract) success.")
-                                print(f"DEBUG_OCR_TEXT: {repr(ocr_text[:500])}")
-                            else:
-                                print(f"DEBUG: No valid headers found in any rotation. Using last result.")
-                                ocr_text = temp_text # Fallback to last attempt
+                    # Rotation fallback: if the probe was wrong (or found nothing), try the rest at full size
+                    for angle, top in attempts:
+                        print(f"DEBUG: Trying OCR with rotation {angle}...")
+                        clip = None
+                        if top is not None:
+                            # The table box is found on the probe, only that clip is rendered
+                            with record.stage('ocr_crop'):
+                                probe = img.rotate(angle, expand=True) if angle else img
+                                box = ocr_table_box(probe, top, max(1, round(OCR_REDUCE * probe_dpi / slot.dpi)))
+                            if box is None:
+                                continue  # nothing to crop; the full-page attempt follows
+                            clip = tuple(v * 72 / probe_dpi for v in box)
+                        with record.stage('rasterize'):
+                            rotated_img = renderer.render(slot.dpi, clip=clip, rotate=angle)
 
-                        except Exception as e:
-                            print(f"Tesseract failed: {e}")
+                        # Binarized, straightened and trimmed (see src/preprocess.py)
+                        with record.stage('ocr_preprocess'):
+                            ocr_img, prep = preprocess(rotated_img)
+                        if prep['skew']:
+                            print(f"DEBUG: Deskewed by {prep['skew']} degrees.")
+                        ocr_pixels += ocr_img.width * ocr_img.height
+                        with record.stage(f'ocr_{angle}'):
+                            temp_text = ocr_engine.image_to_string(ocr_img)
+                        ocr_img = None
+                        # print(f"DEBUG: Rotation {angle} text preview: {repr(temp_text[:200])}")
+                        
+                        if _has_ocr_header(temp_text):
+                            # print(f"DEBUG: Found valid headers at angle {angle}")
+                            valid_ocr_text = temp_text
+                            ocr_angle = angle
+                            break
                     
-                    # EasyOCR Removed to save memory on Cloud
+                    if valid_ocr_text:
+                        ocr_text = valid_ocr_text
+                        print("OCR (Tesseract) success.")
+                        print(f"DEBUG_OCR_TEXT: {repr(ocr_text[:500])}")
+                    else:
+                        print(f"DEBUG: No valid headers found in any rotation. Using last result.")
+                        ocr_text = temp_text # Fallback to last attempt
 
+                except Exception as e:
+                    print(f"Tesseract failed: {e}")
+            
+            # EasyOCR Removed to save memory on Cloud
 
-                    # Parse OCR Output (Same logic as Strategy 2)
-                    if ocr_text:
-                        lines = ocr_text.split('\n')
-                        header_found_in_text = False
+
+            # Parse OCR Output (Same logic as Strategy 2)
+            if ocr_text:
+                lines = ocr_text.split('\n')
+                header_found_in_text = context.get('continued', False)
+                
+                for line in lines:
+                    # Cleanup common OCR garbage/spaces
+                    line = line.strip()
+                    if not line: continue
+                    
+                    # Robust header check
+                    if is_ocr_header_line(line, header_found_in_text):
+                        header_found_in_text = True
+                        continue
+                    
+                    if header_found_in_text:
+                        parts = line.split()
+                        # OCR often splits numbers into parts (e.g. 1, 234 -> 1 234)
+                        # This is a simplified parser assuming good OCR. 
+                        # If OCR is messy, we might need regex.
                         
-                        for line in lines:
-                            # Cleanup common OCR garbage/spaces
-                            line = line.strip()
-                            if not line: continue
+                        # Heuristic: scan for numbers at the end
+                        valid_nums = []
+                        zone_parts = []
+                        
+                        for p in reversed(parts):
+                            # remove commas and %
+                            clean_p = p.replace(',', '').replace('%', '')
                             
-                            # Robust header check
-                            clean_line = line.replace(" ", "")
-                            if '純売上高' in clean_line or '売上' in clean_line or 'ブロック' in clean_line: 
-                                header_found_in_text = True
-                                continue
+                            # Helper to check if string is a number
+                            def is_valid_num(s):
+                                try:
+                                    float(s)
+                                    return True
+                                except:
+                                    return False
+
+                            is_num = False
+                            final_val = clean_p
                             
-                            if header_found_in_text:
-                                parts = line.split()
-                                # OCR often splits numbers into parts (e.g. 1, 234 -> 1 234)
-                                # This is a simplified parser assuming good OCR. 
-                                # If OCR is messy, we might need regex.
-                                
-                                # Heuristic: scan for numbers at the end
-                                valid_nums = []
-                                zone_parts = []
+                            # Case 1: Standard number
+                            if is_valid_num(clean_p):
+                                # Heuristic: If 1 dot and > 2 decimal places, assume it's a separator and strip it.
+                                # (Exceptions: small numbers? But likely safe for this report)
+                                if clean_p.count('.') == 1 and len(clean_p.split('.')[1]) > 2:
+                                     temp = clean_p.replace('.', '')
+                                     if is_valid_num(temp):
+                                         final_val = temp
                                 
-                                for p in reversed(parts):
-                                    # remove commas and %
-                                    clean_p = p.replace(',', '').replace('%', '')
-                                    
-                                    # Helper to check if string is a number
-                                    def is_valid_num(s):
-                                        try:
-                                            float(s)
-                                            return True
-                                        except:
-                                            return False
-
-                                    is_num = False
-                                    final_val = clean_p
-                                    
-                                    # Case 1: Standard number
-                                    if is_valid_num(clean_p):
-                                        # Heuristic: If 1 dot and > 2 decimal places, assume it's a separator and strip it.
-                                        # (Exceptions: small numbers? But likely safe for this report)
-                                        if clean_p.count('.') == 1 and len(clean_p.split('.')[1]) > 2:
-                                             temp = clean_p.replace('.', '')
-                                             if is_valid_num(temp):
-                                                 final_val = temp
-                                        
+                                is_num = True
+                            
+                            # Case 2: OCR noise with dots as thousands separators (e.g. 3.720.970)
+                            # Only enters if NOT valid num (e.g. 2 dots)
+                            elif clean_p.count('.') > 1:
+                                # Try removing all dots (assume integer like 3.720.970)
+                                temp = clean_p.replace('.', '')
+                                if is_valid_num(temp):
+                                    final_val = temp
+                                    is_num = True
+                                else:
+                                    # Try keeping only last dot (e.g. 2.240.39)
+                                    # Split by dot, join all but last, then add dot back
+                                    dot_parts = clean_p.split('.')
+                                    temp2 = "".join(dot_parts[:-1]) + '.' + dot_parts[-1]
+                                    if is_valid_num(temp2):
+                                        final_val = temp2
                                         is_num = True
-                                    
-                                    # Case 2: OCR noise with dots as thousands separators (e.g. 3.720.970)
-                                    # Only enters if NOT valid num (e.g. 2 dots)
-                                    elif clean_p.count('.') > 1:
-                                        # Try removing all dots (assume integer like 3.720.970)
-                                        temp = clean_p.replace('.', '')
+
+                            # Case 3: Negative with triangle
+                            if not is_num and ('△' in p or '▲' in p):
+                                clean_p_neg = p.replace('△', '').replace('▲', '').replace(',', '').replace('%', '')
+                                # Apply same dot logic to negative
+                                if clean_p_neg.count('.') > 1:
+                                     temp = clean_p_neg.replace('.', '')
+                                     if is_valid_num(temp):
+                                         final_val = '-' + temp # Treat as negative
+                                         is_num = True
+                                elif clean_p_neg.count('.') == 1:
+                                    parts_dot = clean_p_neg.split('.')
+                                    if len(parts_dot[1]) > 2:
+                                        temp = clean_p_neg.replace('.', '')
                                         if is_valid_num(temp):
-                                            final_val = temp
+                                            final_val = '-' + temp
                                             is_num = True
-                                        else:
-                                            # Try keeping only last dot (e.g. 2.240.39)
-                                            # Split by dot, join all but last, then add dot back
-                                            dot_parts = clean_p.split('.')
-                                            temp2 = "".join(dot_parts[:-1]) + '.' + dot_parts[-1]
-                                            if is_valid_num(temp2):
-                                                final_val = temp2
-                                                is_num = True
-
-                                    # Case 3: Negative with triangle
-                                    if not is_num and ('△' in p or '▲' in p):
-                                        clean_p_neg = p.replace('△', '').replace('▲', '').replace(',', '').replace('%', '')
-                                        # Apply same dot logic to negative
-                                        if clean_p_neg.count('.') > 1:
-                                             temp = clean_p_neg.replace('.', '')
-                                             if is_valid_num(temp):
-                                                 final_val = '-' + temp # Treat as negative
-                                                 is_num = True
-                                        elif clean_p_neg.count('.') == 1:
-                                            parts_dot = clean_p_neg.split('.')
-                                            if len(parts_dot[1]) > 2:
-                                                temp = clean_p_neg.replace('.', '')
-                                                if is_valid_num(temp):
-                                                    final_val = '-' + temp
-                                                    is_num = True
-                                        
-                                        if not is_num and is_valid_num(clean_p_neg):
-                                            final_val = '-' + clean_p_neg
-                                            is_num = True
-                                    
-                                    if is_num:
-                                        valid_nums.insert(0, final_val)
-                                    else:
-                                        # Not a number.
-                                        # If we already have our 2 target numbers, this is likely Zone text.
-                                        if len(valid_nums) >= 2:
-                                            zone_parts.insert(0, p)
                                 
+                                if not is_num and is_valid_num(clean_p_neg):
+                                    final_val = '-' + clean_p_neg
+                                    is_num = True
+                            
+                            if is_num:
+                                valid_nums.insert(0, final_val)
+                            else:
+                                # Not a number.
+                                # If we already have our 2 target numbers, this is likely Zone text.
                                 if len(valid_nums) >= 2:
-                                    try:
-                                        sls = 0
-                                        s_yoy = 0.0
-                                        cnt = 0
-                                        c_yoy = 0.0
-                                        
-                                        if len(valid_nums) >= 4:
-                                            c_yoy = parse_float(valid_nums[-1])
-                                            cnt = parse_num(valid_nums[-2])
-                                            s_yoy = parse_float(valid_nums[-3])
-                                            sls = parse_num(valid_nums[-4])
-                                        elif len(valid_nums) >= 2:
-                                            # Assuming 2 numbers are Sales and YoY
-                                            v1 = parse_float(valid_nums[0])
-                                            v2 = parse_float(valid_nums[1])
-                                            
-                                            # Disambiguate Sales vs YoY using Magnitude
-                                            # Sales is usually the larger absolute value (millions vs percentage)
-                                            # Unless Sales is 0. 
-                                            
-                                            if abs(v1) > abs(v2):
-                                                sls = int(v1)
-                                                s_yoy = v2
-                                            else:
-                                                sls = int(v2)
-                                                s_yoy = v1
-                                                
-                                            # Edge case: If both are small? Unlikely for "Sales" in this context.
-                                            # But if v1 is 97.80 and v2 is 1.908.111 (parsed as 1908111), logic holds.
-
-                                        # Zone Name reconstruction
-                                        zn = parts[0]
-                                        if zone_parts:
-                                            zn = "".join(zone_parts)
+                                    zone_parts.insert(0, p)
+                        
+                        if len(valid_nums) >= 2:
+                            try:
+                                sls = 0
+                                s_yoy = 0.0
+                                cnt = 0
+                                c_yoy = 0.0
+                                
+                                if len(valid_nums) >= 4:
+                                    c_yoy = parse_float(valid_nums[-1])
+                                    cnt = parse_num(valid_nums[-2])
+                                    s_yoy = parse_float(valid_nums[-3])
+                                    sls = parse_num(valid_nums[-4])
+                                elif len(valid_nums) >= 2:
+                                    # Assuming 2 numbers are Sales and YoY
+                                    v1 = parse_float(valid_nums[0])
+                                    v2 = parse_float(valid_nums[1])
+                                    
+                                    # Disambiguate Sales vs YoY using Magnitude
+                                    # Sales is usually the larger absolute value (millions vs percentage)
+                                    # Unless Sales is 0. 
+                                    
+                                    if abs(v1) > abs(v2):
+                                        sls = int(v1)
+                                        s_yoy = v2
+                                    else:
+                                        sls = int(v2)
+                                        s_yoy = v1
                                         
-                                        # Clean zone name
-                                        zn = zn.replace(" ", "")
-                                        # Remove common OCR trash from zone name start
-                                        trash_chars = ['|', '!', ':', ';', '.']
-                                        for tc in trash_chars:
-                                            zn = zn.replace(tc, '')
-
-                                        # Skip duplicated subtotal in OCR too
-                                        if '准合計' in zn: continue
-
-                                        if sls > 0 or cnt > 0:
-                                             data.append({
-                                                'Date': date_str, 'Zone': zn,
-                                                'Sales': sls, 'Sales_YoY': s_yoy,
-                                                'Count': cnt, 'Count_YoY': c_yoy
-                                            })
-                                    except: pass
+                                    # Edge case: If both are small? Unlikely for "Sales" in this context.
+                                    # But if v1 is 97.80 and v2 is 1.908.111 (parsed as 1908111), logic holds.
 
-                except Exception as e:
-                    print(f"OCR Strategy failed completely: {e}")
+                                # Zone Name reconstruction
+                                zn = parts[0]
+                                if zone_parts:
+                                    zn = "".join(zone_parts)
+                                
+                                # Clean zone name
+                                zn = zn.replace(" ", "")
+                                # Remove common OCR trash from zone name start
+                                trash_chars = ['|', '!', ':', ';', '.']
+                                for tc in trash_chars:
+                                    zn = zn.replace(tc, '')
 
+                                # Skip duplicated subtotal in OCR too
+                                if '准合計' in zn: continue
 
-            # --- FINAL FALLBACK: Prevent App Error ---
-            if not data:
-                print(f"WARNING: Completely failed to extract data from {filename} (likely Image/Vector PDF). Returning placeholder.")
-                # Return a specific error marker so app.py can detect it
-                data.append({
-                    'Date': date_str, 
-                    'Zone': f'ERR:{filename}', # Shortened to prevent UI cutoff
-                    'Sales': 0, 
-                    'Sales_YoY': 0.0,
-                    'Count': 0, 
-                    'Count_YoY': 0.0
-                })
+                                if sls > 0 or cnt > 0:
+                                     data.append({
+                                        'Date': date_str, 'Zone': zn,
+                                        'Sales': sls, 'Sales_YoY': s_yoy,
+                                        'Count': cnt, 'Count_YoY': c_yoy
+                                    })
+                            except: pass
+
+            if data:
+                strategy = 'ocr'
+
+        except Exception as e:
+            print(f"OCR Strategy failed completely: {e}")
+        finally:
+            # Drop the renders before giving their memory back to the budget
+            img = rotated_img = None
+            if renderer is not None:
+                renderer.close()
+            scheduler.release(slot)
 
-            return pd.DataFrame(data)
+    if data:
+        # From here on, a page without a repeated header continues this table
+        context['continued'] = True
+    return {'page': page_number, 'rows': data, 'strategy': strategy, 'tried': tried,
+            'ocr_angle': ocr_angle, 'ocr_pixels': ocr_pixels, 'chars': char_count}
 
+def _extract_worker(pdf_file):
+    """
+    Process-pool entry point. Never raises, so one bad file cannot take down the batch.
+    """
+    try:
+        # Files are already spread over the pool; no nested page pool
+        return extract_from_pdf(pdf_file, page_jobs=1)
     except Exception as e:
-        print(f"Error processing {filename}: {e}")
-        # Return placeholder on exception too
-        return pd.DataFrame([{
-            'Date': date_str if 'date_str' in locals() else "Unknown",
-            'Zone': f'ERR:{filename}',
-            'Sales': 0, 'Sales_YoY': 0.0, 'Count': 0, 'Count_YoY': 0.0
-        }])
+        print(f"Worker failed on {os.path.basename(pdf_file)}: {e}")
+        return _error_frame(pdf_file, e)
 
-def process_all_pdfs(input_dir):
-    pdf_files = glob.glob(os.path.join(input_dir, "*.pdf"))
-    all_data = []
-    
+def _error_frame(pdf_file, error):
+    # Same placeholder extract_from_pdf returns, so app.py flags the file
+    filename = os.path.basename(pdf_file)
+    date_match = re.search(r'202\d{5}', filename)
+    return schema.error_frame(date_match.group(0) if date_match else "Unknown", f"{filename}: {error}")
+
+def iter_pdfs(pdf_files, jobs=1, cache=None, sink=None):
+    """
+    Yields (pdf_file, df) for each path as soon as its rows are ready:
+    cache hits first, then extracted files in completion order.
+    jobs > 1 (or None for all cores) spreads the misses over a process pool; a file
+    that kills its worker gets an error frame, the others are extracted again.
+    cache (src.cache.ExtractionCache) is checked first; only misses are extracted.
+    sink receives one timing record per extracted file (see extract_from_pdf).
+    """
+    # Cache lookups happen in this process so hit/miss counters stay accurate
+    keys = {}
+    pending = []
     for pdf_file in pdf_files:
-        df = extract_from_pdf(pdf_file)
-        if df is not None and not df.empty:
-            all_data.append(df)
-            
-    if all_data:
-        final_df = pd.concat(all_data, ignore_index=True)
-        return final_df
-    else:
-        return pd.DataFrame()
+        if cache is not None:
+            with open(pdf_file, 'rb') as f:
+                keys[pdf_file] = cache.key(f.read(), os.path.basename(pdf_file))
+            df = cache.get(keys[pdf_file])
+            if df is not None:
+                yield pdf_file, df
+                continue
+        pending.append(pdf_file)
+
+    if jobs is None:
+        jobs = os.cpu_count() or 1
+    jobs = max(1, min(jobs, len(pending)))
+
+    if jobs == 1:
+        for pdf_file in pending:
+            df = extract_from_pdf(pdf_file, sink=sink)
+            if cache is not None:
+                cache.put(keys[pdf_file], df)
+            yield pdf_file, df
+        return
+
+    # A worker that dies (e.g. killed by the OS) breaks the pool for every file it still
+    # held; those are run again each in a worker of its own, so only the file that
+    # kills its worker fails
+    lost = []
+    for pdf_file, df in _pool_results(pending, jobs):
+        if df is None:
+            lost.append(pdf_file)
+            continue
+        yield _finish_pooled(pdf_file, df, keys, cache, sink)
+    if lost:
+        print(f"Worker pool broke; retrying {len(lost)} files one per worker")
+    for pdf_file, df in _isolated_results(lost, jobs):
+        yield _finish_pooled(pdf_file, df, keys, cache, sink)
+
+def _finish_pooled(pdf_file, df, keys, cache, sink):
+    # Sinks are not shared with the workers; records travel back on the frame
+    if sink is not None and df is not None and 'extraction' in df.attrs:
+        sink(df.attrs['extraction'])
+    if cache is not None:
+        cache.put(keys[pdf_file], df)
+    return pdf_file, df
+
+def _pool_results(pdf_files, jobs):
+    # (pdf_file, df) in completion order; df is None for files lost to a broken pool
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+    from concurrent.futures.process import BrokenProcessPool
+    # The workers share one OCR memory budget (see src/ocr.py)
+    executor = ProcessPoolExecutor(max_workers=jobs, initializer=ocr.init_pool_worker, initargs=(jobs,))
+    try:
+        futures = {executor.submit(_extract_worker, pdf_file): pdf_file for pdf_file in pdf_files}
+        for future in as_completed(futures):
+            pdf_file = futures[future]
+            try:
+                df = future.result()
+            except BrokenProcessPool:
+                df = None
+            except Exception as e:
+                df = _error_frame(pdf_file, e)
+            yield pdf_file, df
+    finally:
+        # Also reached when the consumer stops iterating early
+        executor.shutdown(wait=True, cancel_futures=True)
+
+def _isolated_results(pdf_files, jobs):
+    # (pdf_file, df) with each file in a one-worker pool of its own, `jobs` at a time
+    from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+    queue = list(pdf_files)
+    running = {}
+    try:
+        while queue or running:
+            while queue and len(running) < jobs:
+                pdf_file = queue.pop(0)
+                executor = ProcessPoolExecutor(max_workers=1, initializer=ocr.init_pool_worker, initargs=(jobs,))
+                running[executor.submit(_extract_worker, pdf_file)] = (pdf_file, executor)
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                pdf_file, executor = running.pop(future)
+                executor.shutdown(wait=False)
+                try:
+                    df = future.result()
+                except Exception as e:
+                    print(f"Worker crashed on {os.path.basename(pdf_file)}: {e}")
+                    df = _error_frame(pdf_file, e)
+                yield pdf_file, df
+    finally:
+        for pdf_file, executor in running.values():
+            executor.shutdown(wait=True, cancel_futures=True)
+
+def process_all_pdfs(input_dir, jobs=1, cache=None, sink=None, store=None):
+    """
+    Extracts every PDF in input_dir and concatenates the rows.
+    Same options as iter_pdfs; output order always follows the globbed file order,
+    regardless of which worker finishes first.
+    store (src.store.HistoryStore) receives each file's rows, keyed by content hash.
+    """
+    pdf_files = glob.glob(os.path.join(input_dir, "*.pdf"))
+    results = {}
+    for pdf_file, df in iter_pdfs(pdf_files, jobs=jobs, cache=cache, sink=sink):
+        results[pdf_file] = df
+        if store is not None:
+            with open(pdf_file, 'rb') as f:
+                store.add_rows(df, hashlib.sha256(f.read()).hexdigest())
+
+    return schema.concat(results[pdf_file] for pdf_file in pdf_files)
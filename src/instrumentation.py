@@ -0,0 +1,95 @@
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+
+class ExtractionRecord:
+    """
+    Structured trace of one extract_from_pdf call: which strategies were tried,
+    which one produced the rows, and how long each stage took (seconds).
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.strategies_tried = []
+        self.strategy = None
+        self.stages = {}
+        self.page_width = None
+        self.page_height = None
+        self.char_count = None
+        self.page_count = None
+        self.pages_read = None
+        self.ocr_angle = None
+        self.ocr_pixels = 0
+        self.rows = 0
+        self.error = None
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            # Stages can repeat (e.g. one per OCR rotation), so accumulate
+            self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - start
+
+    def try_strategy(self, name):
+        self.strategies_tried.append(name)
+
+    def to_dict(self):
+        return {
+            'filename': self.filename,
+            'strategies_tried': list(self.strategies_tried),
+            'strategy': self.strategy,
+            'stages': {name: round(seconds, 6) for name, seconds in self.stages.items()},
+            'page_width': self.page_width,
+            'page_height': self.page_height,
+            'char_count': self.char_count,
+            'page_count': self.page_count,
+            'pages_read': self.pages_read,
+            'ocr_angle': self.ocr_angle,
+            'ocr_pixels': self.ocr_pixels,
+            'rows': self.rows,
+            'error': self.error,
+        }
+
+
+class JsonLinesSink:
+    """
+    Appends each record as one JSON line. Safe to share between threads.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def __call__(self, record):
+        line = json.dumps(record, ensure_ascii=False)
+        with self._lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line + '\n')
+
+
+def records_to_frame(records):
+    """
+    Flattens records into one row per file with a column per stage (milliseconds).
+    """
+    import pandas as pd
+
+    rows = []
+    for record in records:
+        row = {
+            'File': record['filename'],
+            'Strategy': record['strategy'],
+            'Tried': ' → '.join(record['strategies_tried']),
+            'Rows': record['rows'],
+            'Pages': f"{record.get('pages_read')}/{record.get('page_count')}" if record.get('page_count') else None,
+            'Chars': record['char_count'],
+            'OCR angle': record['ocr_angle'],
+            'OCR Mpx': round(record.get('ocr_pixels', 0) / 1e6, 2) or None,
+        }
+        for name, seconds in record['stages'].items():
+            row[f'{name} (ms)'] = round(seconds * 1000, 1)
+        rows.append(row)
+    return pd.DataFrame(rows)
@@ -0,0 +1,190 @@
+"""
+One layout pass per page, shared by the text-layer strategies in the extractor.
+
+pdfplumber's extract_table(), extract_table(text strategy) and extract_text() each
+group the page's chars into words again. PageLayout groups them once and hands the
+same words to the text-strategy table finder (as its word source) and to the text
+lines, so falling through the strategy chain costs one word pass instead of three.
+"""
+import inspect
+from functools import cached_property
+
+from pdfplumber.table import TableFinder, TableSettings
+from pdfplumber.utils import cluster_objects
+from pdfplumber.utils.text import WordExtractor, extract_text, get_line_cluster_key
+
+_WORD_DEFAULTS = {name: param.default for name, param in inspect.signature(WordExtractor).parameters.items()}
+
+# The zone table starts at the row holding these headings (first match wins) ...
+HEADER_KEYS = ('純売上高', 'ブロック／業種')
+# ... and ends with this row
+TOTAL_KEY = '総合計'
+# Points kept above the header text and below the total row, enough for the ruling lines
+REGION_PAD = 18
+
+
+def _word_key(settings):
+    # Settings that only restate a default share the cached words
+    return tuple(sorted((name, value) for name, value in (settings or {}).items()
+                        if _WORD_DEFAULTS.get(name, object()) != value))
+
+
+class PageLayout:
+    """
+    Cached layout of one pdfplumber page: chars, ruling edges and words.
+
+    Also stands in for the page when handed to pdfplumber's TableFinder, which only
+    needs bbox, chars, edges and extract_words(). record (ExtractionRecord, optional)
+    gets a 'words' stage for each word pass actually computed.
+    """
+
+    def __init__(self, page, record=None):
+        self.page = page
+        self.record = record
+        self.bbox = page.bbox
+        self._words = {}
+
+    @cached_property
+    def chars(self):
+        return self.page.chars
+
+    def _find(self, key):
+        # Chars of the first occurrence of key, matched on consecutive chars in stream order
+        # (no word pass needed: a heading is drawn as one run of text)
+        chars = self.chars
+        first = key[0]
+        for i, char in enumerate(chars):
+            if char['text'] == first and ''.join(c['text'] for c in chars[i:i + len(key)]) == key:
+                return chars[i:i + len(key)]
+        return None
+
+    def table_region(self):
+        """
+        Bounding box of the zone table, anchored on its header row: from just above the
+        header to just below the 総合計 row (or the page bottom), full page width.
+        None if the page has no header (e.g. a continuation page).
+        """
+        for key in HEADER_KEYS:
+            header = self._find(key)
+            if header:
+                break
+        else:
+            return None
+        x0, top, x1, bottom = self.bbox
+        region_top = max(top, min(char['top'] for char in header) - REGION_PAD)
+        total = self._find(TOTAL_KEY)
+        if total and total[0]['top'] > region_top:
+            bottom = min(bottom, max(char['bottom'] for char in total) + REGION_PAD)
+        if region_top <= top and bottom >= self.bbox[3]:
+            return None  # nothing to crop
+        return (x0, region_top, x1, bottom)
+
+    def crop(self, bbox):
+        """
+        Layout of the part of the page inside bbox; its words are computed from the cropped chars.
+        """
+        return PageLayout(self.page.crop(bbox), self.record)
+
+    @cached_property
+    def edges(self):
+        return self.page.edges
+
+    def extract_words(self, return_chars=False, **settings):
+        key = _word_key(settings)
+        if key not in self._words:
+            if self.record is not None:
+                with self.record.stage('words'):
+                    self._words[key] = WordExtractor(**dict(key)).extract_words(self.chars, return_chars=True)
+            else:
+                self._words[key] = WordExtractor(**dict(key)).extract_words(self.chars, return_chars=True)
+        if return_chars:
+            return self._words[key]
+        # pdfplumber's word dicts, without the chars (table edge detection copies them)
+        return [{k: v for k, v in word.items() if k != 'chars'} for word in self._words[key]]
+
+    @property
+    def words(self):
+        return self.extract_words()
+
+    def extract_table(self, table_settings=None):
+        """
+        Same result as page.extract_table(table_settings); text strategies reuse the cached words.
+        """
+        settings = TableSettings.resolve(table_settings)
+        tables = TableFinder(self, settings).tables
+        if not tables:
+            return None
+        # Largest table by cell count, as pdfplumber picks it
+        table = min(tables, key=lambda t: (-len(t.cells), t.bbox[1], t.bbox[0]))
+        text_settings = settings.text_settings or {}
+        if _word_key(text_settings):
+            return table.extract(**text_settings)
+        return self._extract_cells(table)
+
+    @cached_property
+    def _word_spans(self):
+        # Char-midpoint extent of each word: (h_min, h_max, v_min, v_max), as Table.extract assigns chars
+        spans = []
+        for word in self.extract_words(return_chars=True):
+            h_mids = [(char['x0'] + char['x1']) / 2 for char in word['chars']]
+            v_mids = [(char['top'] + char['bottom']) / 2 for char in word['chars']]
+            spans.append((min(h_mids), max(h_mids), min(v_mids), max(v_mids)))
+        return spans
+
+    def _extract_cells(self, table):
+        """
+        Table.extract() with cell text assembled from the cached words. A cell that a
+        word only partly falls into is rebuilt from its chars, exactly as pdfplumber does.
+        """
+        words = self.extract_words(return_chars=True)
+        spans = self._word_spans
+        rows = []
+        for row in table.rows:
+            x0, top, x1, bottom = row.bbox
+            row_words = [i for i, (h0, h1, v0, v1) in enumerate(spans)
+                         if h1 >= x0 and h0 < x1 and v1 >= top and v0 < bottom]
+            cells = []
+            for cell in row.cells:
+                if cell is None:
+                    cells.append(None)
+                    continue
+                x0, top, x1, bottom = cell
+                inside = []
+                split = False
+                for i in row_words:
+                    h0, h1, v0, v1 = spans[i]
+                    if h1 < x0 or h0 >= x1 or v1 < top or v0 >= bottom:
+                        continue
+                    if h0 >= x0 and h1 < x1 and v0 >= top and v1 < bottom:
+                        inside.append(words[i])
+                    else:
+                        split = True
+                        break
+                if split:
+                    cell_chars = [char for char in self.chars if _mid_in_bbox(char, cell)]
+                    cells.append(extract_text(cell_chars) if cell_chars else '')
+                else:
+                    cells.append(_join_lines(inside))
+            rows.append(cells)
+        return rows
+
+    def extract_text(self):
+        """
+        Same text as page.extract_text() (default settings), built from the cached words.
+        """
+        return _join_lines(self.extract_words(return_chars=True), preserve_order=True)
+
+
+def _mid_in_bbox(char, bbox):
+    h_mid = (char['x0'] + char['x1']) / 2
+    v_mid = (char['top'] + char['bottom']) / 2
+    return bbox[0] <= h_mid < bbox[2] and bbox[1] <= v_mid < bbox[3]
+
+
+def _join_lines(words, preserve_order=False):
+    # Words -> text the way pdfplumber's non-layout extract_text does: one line per cluster of tops
+    if not words:
+        return ""
+    lines = cluster_objects(words, get_line_cluster_key(_WORD_DEFAULTS['line_dir']),
+                            _WORD_DEFAULTS['y_tolerance'], preserve_order=preserve_order)
+    return "\n".join(" ".join(word['text'] for word in line) for line in lines)
@@ -0,0 +1,510 @@
+"""
+OCR engines for the scan fallback in the extractor.
+
+pytesseract runs one tesseract process per call: the page is written to a temp
+file and the large jpn traineddata is loaded again every time, up to five times
+per scanned file with the orientation probe and rotation retries. TesserocrEngine
+keeps a pool of initialized Tesseract instances in the process instead (tesserocr,
+in requirements.txt; its wheels bundle libtesseract, the traineddata comes from the
+apt packages) and hands them PIL images directly; it releases the GIL while
+recognizing, so the pool serves the app's upload threads in parallel. Process-pool
+workers each keep their own pool warm across files. If tesserocr cannot be imported
+or loaded, PytesseractEngine is the same interface over pytesseract.
+
+get_engine() returns the shared engine (None if no OCR is installed);
+set_engine() replaces it, e.g. with a FakeOcrEngine to run the OCR path without
+tesseract. Every engine reports call counts, latency and throughput via stats().
+
+Rendered pages are the memory peak of a scan (~9 Mpx per A4 page at 300dpi), so
+OCR pages are admitted by an OcrScheduler (get_scheduler()) against a per-process
+memory budget, in arrival order. A page that waits too long for the budget is
+rendered at a lower resolution instead.
+"""
+import collections
+import os
+from contextlib import contextmanager
+import queue
+import signal
+import statistics
+import threading
+import time
+
+
+def _import_tesserocr():
+    # tesserocr imports cysignals, which installs a SIGINT handler on import; only the
+    # main thread may do that, and Streamlit runs the app on a script thread. Off the
+    # main thread the import goes through without that handler (Ctrl-C is the server's)
+    try:
+        import tesserocr
+        return tesserocr
+    except ImportError:  # optional, in-process Tesseract binding
+        return None
+    except ValueError:
+        if threading.current_thread() is threading.main_thread():
+            raise
+    real_signal = signal.signal
+
+    def main_thread_only(signum, handler):
+        try:
+            return real_signal(signum, handler)
+        except ValueError:
+            return signal.getsignal(signum)
+
+    signal.signal = main_thread_only
+    try:
+        import tesserocr
+        return tesserocr
+    finally:
+        signal.signal = real_signal
+
+
+tesserocr = _import_tesserocr()
+
+try:
+    import pytesseract
+    # Set Tesseract path for Windows
+    if os.name == 'nt':
+        tess_path = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
+        if os.path.exists(tess_path):
+            pytesseract.pytesseract.tesseract_cmd = tess_path
+    # On Linux (Streamlit Cloud), tesseract is usually in PATH, so no need to set cmd.
+except ImportError:
+    pytesseract = None
+    print("WARNING: pytesseract import failed.")
+
+LANG = 'jpn'
+# Warm Tesseract instances per process (each holds its own copy of the traineddata)
+DEFAULT_WORKERS = int(os.environ.get('WEEKLY_REPORT_OCR_WORKERS', '2'))
+# Latencies kept for the percentiles in stats()
+LATENCY_WINDOW = 1000
+
+# Memory for rendered OCR pages: the app serves all sessions from one process and its
+# budget; a process pool (batch extraction, the folder watcher, page-parallel extraction)
+# splits the same amount among its workers (init_pool_worker), so N workers do not get N x
+OCR_MEMORY_MB = int(os.environ.get('WEEKLY_REPORT_OCR_MEMORY_MB', '256'))
+# Render resolutions, preferred first; later ones are used when the budget is tight
+OCR_DPIS = (300, 200)
+# Seconds a page waits at one resolution before asking for the next lower one
+DOWNGRADE_AFTER = 5.0
+# Bytes held per rendered pixel: the grayscale render (1), preprocessing's working arrays
+# (3: threshold, ink mask and neighbour counts) and the 150dpi probe; the OCR path peaks
+# at 4.3 bytes per pixel of a full 300dpi page (tracemalloc), rounded up
+BYTES_PER_PIXEL = 5
+
+# Where apt's tesseract-ocr-* packages install the traineddata (packages.txt). The
+# tesserocr wheel bundles its own libtesseract, which does not look there by itself
+SYSTEM_TESSDATA = ['/usr/share/tesseract-ocr/5/tessdata', '/usr/share/tesseract-ocr/4.00/tessdata',
+                   '/usr/share/tessdata']
+
+_DATA_KEYS = ['level', 'page_num', 'block_num', 'par_num', 'line_num', 'word_num',
+              'left', 'top', 'width', 'height', 'conf', 'text']
+
+
+def tessdata_path():
+    # TESSDATA_PREFIX if set; custom tessdata in the project root (mainly for local
+    # Windows dev); on Linux/Cloud the apt-installed tessdata
+    if os.environ.get('TESSDATA_PREFIX'):
+        return os.environ['TESSDATA_PREFIX']
+    local_tessdata = os.path.join(os.getcwd(), 'tessdata')
+    if os.path.exists(local_tessdata) and os.name == 'nt':
+        return local_tessdata
+    if os.name != 'nt':
+        for path in SYSTEM_TESSDATA:
+            if os.path.isdir(path):
+                return path
+    return None
+
+
+class OcrEngine:
+    """
+    Common interface: image_to_string / image_to_data (pytesseract's DICT layout) /
+    image_to_osd ({'rotate': clockwise degrees}) on PIL images, plus stats().
+    Subclasses implement the _string / _data / _osd methods; calls are timed here.
+    """
+    name = 'base'
+    workers = 1
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._latencies = collections.deque(maxlen=LATENCY_WINDOW)
+        self.calls = collections.Counter()
+        self.busy_seconds = 0.0
+        self.pixels = 0
+        self.errors = 0
+
+    def _timed(self, kind, fn, img):
+        start = time.perf_counter()
+        failed = True
+        try:
+            result = fn(img)
+            failed = False
+            return result
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self.errors += failed
+                self.calls[kind] += 1
+                self.busy_seconds += elapsed
+                self.pixels += img.width * img.height
+                self._latencies.append(elapsed)
+
+    def image_to_string(self, img):
+        return self._timed('string', self._string, img)
+
+    def image_to_data(self, img):
+        return self._timed('data', self._data, img)
+
+    def image_to_osd(self, img):
+        return self._timed('osd', self._osd, img)
+
+    def close(self):
+        pass
+
+    def stats(self):
+        """
+        Calls by kind (failed ones included and also counted in errors), per-call
+        latency (mean/p50/p95/max, ms) and throughput. busy_seconds adds up the calls,
+        so calls_per_second is per worker when calls overlap.
+        """
+        with self._lock:
+            latencies = sorted(self._latencies)
+            calls = sum(self.calls.values())
+            stats = {'engine': self.name, 'workers': self.workers, 'calls': calls,
+                     'by_kind': dict(self.calls), 'errors': self.errors, 'busy_seconds': round(self.busy_seconds, 3)}
+            if latencies:
+                stats.update({
+                    'mean_ms': round(statistics.mean(latencies) * 1000, 1),
+                    'p50_ms': round(latencies[len(latencies) // 2] * 1000, 1),
+                    'p95_ms': round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000, 1),
+                    'max_ms': round(latencies[-1] * 1000, 1),
+                    'calls_per_second': round(calls / self.busy_seconds, 2) if self.busy_seconds else None,
+                    'mpx_per_second': round(self.pixels / 1e6 / self.busy_seconds, 2) if self.busy_seconds else None,
+                })
+            return stats
+
+
+class TesserocrEngine(OcrEngine):
+    """
+    Pool of `workers` initialized tesserocr APIs; a call borrows one for its duration.
+    The OSD instance (osd traineddata) is created on first use.
+    """
+    name = 'tesserocr'
+
+    def __init__(self, workers=DEFAULT_WORKERS, lang=LANG, path=None):
+        super().__init__()
+        self.workers = max(1, workers)
+        self.lang = lang
+        self.path = path if path is not None else tessdata_path()
+        self._pool = queue.Queue()
+        self._apis = []
+        for _ in range(self.workers):
+            api = self._api(lang)
+            self._apis.append(api)
+            self._pool.put(api)
+        self._osd_api = None
+        self._osd_lock = threading.Lock()
+
+    def _api(self, lang, **kwargs):
+        if self.path:
+            return tesserocr.PyTessBaseAPI(path=self.path, lang=lang, **kwargs)
+        return tesserocr.PyTessBaseAPI(lang=lang, **kwargs)
+
+    def _run(self, img, read):
+        api = self._pool.get()
+        try:
+            api.SetImage(img)
+            return read(api)
+        finally:
+            api.Clear()
+            self._pool.put(api)
+
+    def _string(self, img):
+        return self._run(img, lambda api: api.GetUTF8Text())
+
+    def _data(self, img):
+        # Tesseract's TSV is what pytesseract parses into its DICT output
+        tsv = self._run(img, lambda api: api.GetTSVText(0))
+        data = {key: [] for key in _DATA_KEYS}
+        for line in tsv.splitlines():
+            fields = line.split('\t')
+            if len(fields) < len(_DATA_KEYS):
+                fields += [''] * (len(_DATA_KEYS) - len(fields))
+            for key, value in zip(_DATA_KEYS, fields):
+                data[key].append(value if key == 'text' else int(float(value)))
+        return data
+
+    def _osd(self, img):
+        with self._osd_lock:
+            if self._osd_api is None:
+                self._osd_api = self._api('osd', psm=tesserocr.PSM.OSD_ONLY)
+            self._osd_api.SetImage(img)
+            try:
+                result = self._osd_api.DetectOrientationScript()
+            finally:
+                self._osd_api.Clear()
+        if not result:
+            raise RuntimeError("OSD found too little text")
+        # orient_deg is how far the text is turned; the correction turns it back
+        return {'rotate': (360 - int(result['orient_deg'])) % 360}
+
+    def close(self):
+        for api in self._apis:
+            api.End()
+        if self._osd_api is not None:
+            self._osd_api.End()
+
+
+class PytesseractEngine(OcrEngine):
+    """
+    pytesseract behind the engine interface: one tesseract process per call, at most
+    `workers` at a time.
+    """
+    name = 'pytesseract'
+
+    def __init__(self, workers=DEFAULT_WORKERS, lang=LANG):
+        super().__init__()
+        self.workers = max(1, workers)
+        self.lang = lang
+        self._slots = threading.Semaphore(self.workers)
+        path = tessdata_path()
+        if path:
+            os.environ['TESSDATA_PREFIX'] = path
+
+    def _string(self, img):
+        with self._slots:
+            return pytesseract.image_to_string(img, lang=self.lang)
+
+    def _data(self, img):
+        with self._slots:
+            return pytesseract.image_to_data(img, lang=self.lang, output_type=pytesseract.Output.DICT)
+
+    def _osd(self, img):
+        with self._slots:
+            return pytesseract.image_to_osd(img, output_type=pytesseract.Output.DICT)
+
+
+class FakeOcrEngine(OcrEngine):
+    """
+    Stand-in engine that returns fixed results, for exercising the OCR path without
+    tesseract. text is returned by image_to_string (a callable gets the image);
+    lines ([(text, top), ...]) make up image_to_data, by default the lines of text
+    20px apart. rotate is the OSD answer (None: OSD unavailable). latency (seconds)
+    is slept per call. Each image passed in is kept in self.images as (kind, size).
+    """
+    name = 'fake'
+
+    def __init__(self, text='', lines=None, rotate=0, latency=0.0):
+        super().__init__()
+        self.text = text
+        self.lines = lines
+        self.rotate = rotate
+        self.latency = latency
+        self.images = []
+
+    def _call(self, kind, img):
+        self.images.append((kind, img.size))
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _text_for(self, img):
+        return self.text(img) if callable(self.text) else self.text
+
+    def _string(self, img):
+        self._call('string', img)
+        return self._text_for(img)
+
+    def _data(self, img):
+        self._call('data', img)
+        lines = self.lines
+        if lines is None:
+            lines = [(line, i * 20) for i, line in enumerate(self._text_for(img).splitlines())]
+        data = {key: [] for key in _DATA_KEYS}
+        for i, (text, top) in enumerate(lines, start=1):
+            row = {'level': 5, 'page_num': 1, 'block_num': 1, 'par_num': 1, 'line_num': i, 'word_num': 1,
+                   'left': 0, 'top': top, 'width': img.width, 'height': 20, 'conf': 90, 'text': text}
+            for key in _DATA_KEYS:
+                data[key].append(row[key])
+        return data
+
+    def _osd(self, img):
+        self._call('osd', img)
+        if self.rotate is None:
+            raise RuntimeError("OSD unavailable")
+        return {'rotate': self.rotate}
+
+
+OcrSlot = collections.namedtuple('OcrSlot', ['dpi', 'cost', 'wait'])
+
+
+class OcrScheduler:
+    """
+    Admits OCR pages against a memory budget (bytes), first come first served.
+
+    acquire() blocks until the page's estimated render size fits in what is left of
+    the budget, and returns the dpi to render at. After waiting downgrade_after
+    seconds it asks for the next resolution in dpis, which costs less; a page that
+    does not fit even when nothing else runs takes the first resolution that does
+    (or the lowest one, admitted alone). release() returns the memory.
+    """
+
+    def __init__(self, budget_bytes=OCR_MEMORY_MB * 2**20, dpis=OCR_DPIS, downgrade_after=DOWNGRADE_AFTER):
+        self.budget = budget_bytes
+        self.dpis = tuple(dpis)
+        self.downgrade_after = downgrade_after
+        self._cond = threading.Condition()
+        self._queue = collections.deque()
+        self._in_use = 0
+        self.counts = collections.Counter()  # admitted per dpi
+        self.max_depth = 0
+        self.peak_bytes = 0
+        self.wait_seconds = 0.0
+        self.max_wait = 0.0
+
+    def cost(self, width_pt, height_pt, dpi):
+        return int(width_pt * dpi / 72) * int(height_pt * dpi / 72) * BYTES_PER_PIXEL
+
+    def acquire(self, width_pt, height_pt):
+        """
+        Waits for room for one page of width_pt x height_pt points; returns an OcrSlot.
+        """
+        costs = [self.cost(width_pt, height_pt, dpi) for dpi in self.dpis]
+        # Resolutions that could never fit are skipped up front
+        level = next((i for i, cost in enumerate(costs) if cost <= self.budget), len(costs) - 1)
+        ticket = object()
+        start = time.perf_counter()
+        with self._cond:
+            self._queue.append(ticket)
+            self.max_depth = max(self.max_depth, len(self._queue))
+            try:
+                while True:
+                    fits = self._in_use + costs[level] <= self.budget or self._in_use == 0
+                    if self._queue[0] is ticket and fits:
+                        break
+                    timeout = None
+                    if level < len(costs) - 1:
+                        timeout = start + self.downgrade_after * (level + 1) - time.perf_counter()
+                        if timeout <= 0:
+                            level += 1
+                            continue
+                    self._cond.wait(timeout)
+            finally:
+                self._queue.remove(ticket)
+                self._cond.notify_all()  # the next page in line may fit now
+            wait = time.perf_counter() - start
+            self._in_use += costs[level]
+            self.peak_bytes = max(self.peak_bytes, self._in_use)
+            self.counts[self.dpis[level]] += 1
+            self.wait_seconds += wait
+            self.max_wait = max(self.max_wait, wait)
+        return OcrSlot(self.dpis[level], costs[level], wait)
+
+    def release(self, slot):
+        with self._cond:
+            self._in_use -= slot.cost
+            self._cond.notify_all()
+
+    @contextmanager
+    def page(self, width_pt, height_pt):
+        slot = self.acquire(width_pt, height_pt)
+        try:
+            yield slot
+        finally:
+            self.release(slot)
+
+    def stats(self):
+        """
+        Queue depth (now and max), wait time (total/mean/max, ms), memory in use and
+        its peak (MB), and pages admitted per dpi.
+        """
+        with self._cond:
+            admitted = sum(self.counts.values())
+            return {
+                'budget_mb': round(self.budget / 2**20, 1),
+                'queued': len(self._queue),
+                'max_queued': self.max_depth,
+                'in_use_mb': round(self._in_use / 2**20, 1),
+                'peak_mb': round(self.peak_bytes / 2**20, 1),
+                'admitted': admitted,
+                'by_dpi': dict(self.counts),
+                'wait_total_ms': round(self.wait_seconds * 1000, 1),
+                'wait_mean_ms': round(self.wait_seconds * 1000 / admitted, 1) if admitted else None,
+                'wait_max_ms': round(self.max_wait * 1000, 1),
+            }
+
+
+_engine = None
+_engine_lock = threading.Lock()
+_engine_checked = False
+_scheduler = None
+
+
+def create_engine(workers=DEFAULT_WORKERS):
+    """
+    TesserocrEngine if tesserocr is installed and loads, else PytesseractEngine,
+    else None.
+    """
+    if tesserocr is not None:
+        try:
+            return TesserocrEngine(workers=workers)
+        except Exception as e:
+            # e.g. jpn traineddata missing for the library build
+            print(f"WARNING: tesserocr unavailable ({e}). Using pytesseract.")
+    if pytesseract is not None:
+        return PytesseractEngine(workers=workers)
+    return None
+
+
+def get_engine():
+    """
+    The shared engine of this process, created (and warmed) on first use; None without OCR.
+    """
+    global _engine, _engine_checked
+    with _engine_lock:
+        if not _engine_checked:
+            _engine = create_engine()
+            _engine_checked = True
+            if _engine is not None:
+                print(f"DEBUG: OCR engine {_engine.name} ({_engine.workers} workers).")
+        return _engine
+
+
+def set_engine(engine):
+    """
+    Replaces the shared engine (None disables OCR). Returns the previous one.
+    """
+    global _engine, _engine_checked
+    with _engine_lock:
+        previous = _engine
+        _engine = engine
+        _engine_checked = True
+        return previous
+
+
+def get_scheduler():
+    """
+    The shared OcrScheduler of this process.
+    """
+    global _scheduler
+    with _engine_lock:
+        if _scheduler is None:
+            _scheduler = OcrScheduler()
+        return _scheduler
+
+
+def init_pool_worker(workers):
+    """
+    ProcessPoolExecutor initializer: this worker's scheduler gets 1/workers of
+    OCR_MEMORY_MB (pages that no longer fit at 300dpi are rendered at 200dpi).
+    """
+    set_scheduler(OcrScheduler(OCR_MEMORY_MB * 2**20 // max(1, workers)))
+
+
+def set_scheduler(scheduler):
+    """
+    Replaces the shared scheduler. Returns the previous one.
+    """
+    global _scheduler
+    with _engine_lock:
+        previous = _scheduler
+        _scheduler = scheduler
+        return previous
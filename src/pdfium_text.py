@@ -0,0 +1,115 @@
+"""
+Fast text-layer path: the zone table rebuilt from pypdfium2 char boxes.
+
+pdfplumber reads the text layer through pdfminer, which is slow on the Japanese
+CID fonts these reports use; pdfium (already installed for page.to_image) gives
+the same chars with positions in a few milliseconds. page_table() groups them into
+words and lines and lays the lines out on the columns of the header row, giving
+the same list-of-rows shape as pdfplumber's extract_table(), so the extractor
+parses it with the same code. Anything it cannot lay out returns None and the
+pdfplumber strategies run as before.
+"""
+import threading
+
+import pypdfium2 as pdfium
+
+# Header cell the column layout is anchored on
+HEADER_KEY = '純売上高'
+# The table ends with this row (as src.layout.TOTAL_KEY); footer lines below it are left out
+TOTAL_KEY = '総合計'
+# Chars whose vertical centres are this close (points) are on the same line
+LINE_TOLERANCE = 3
+# A horizontal gap wider than this fraction of the char height starts a new word
+WORD_GAP = 0.5
+
+# pdfium is not thread-safe; the app extracts uploads on a thread pool
+_lock = threading.Lock()
+
+
+def _chars(textpage, page_height):
+    # (text, x0, top, x1, bottom) per char, top-down coordinates as in pdfplumber
+    count = textpage.count_chars()
+    text = textpage.get_text_range(0, count)
+    if len(text) != count:  # chars outside the BMP; index i is no longer text[i]
+        text = [textpage.get_text_range(i, 1) for i in range(count)]
+    chars = []
+    for i in range(count):
+        if text[i].isspace():
+            chars.append((' ', 0, 0, 0, 0))
+            continue
+        left, bottom, right, top = textpage.get_charbox(i, loose=True)
+        chars.append((text[i], left, page_height - top, right, page_height - bottom))
+    return chars
+
+
+def _words(chars):
+    # (text, x0, x1, v_mid): runs of chars on one line with no space or wide gap between them
+    words = []
+    run = []
+    for char in chars + [(' ', 0, 0, 0, 0)]:
+        if run:
+            last = run[-1]
+            height = last[4] - last[2]
+            same_line = abs((char[2] + char[4]) / 2 - (last[2] + last[4]) / 2) <= LINE_TOLERANCE
+            if char[0] == ' ' or not same_line or char[1] - last[3] > height * WORD_GAP:
+                words.append((''.join(c[0] for c in run), run[0][1], run[-1][3],
+                              sum(c[2] + c[4] for c in run) / (2 * len(run))))
+                run = []
+        if char[0] != ' ':
+            run.append(char)
+    return words
+
+
+def _lines(words):
+    # Words grouped by vertical centre, top to bottom, each line left to right
+    lines = []
+    for word in sorted(words, key=lambda w: w[3]):
+        if lines and word[3] - lines[-1][-1][3] <= LINE_TOLERANCE:
+            lines[-1].append(word)
+        else:
+            lines.append([word])
+    return [sorted(line, key=lambda w: w[1]) for line in lines]
+
+
+def page_table(pdf_source, page_index=0):
+    """
+    The zone table of one page as rows of cell strings (header row included, down to
+    the 総合計 row if there is one), and {'chars', 'page_count', 'width', 'height'} of
+    the document and page.
+    pdf_source is a path, bytes or a binary file object.
+    The table is None if the page has no header row to lay the columns on.
+    """
+    with _lock:
+        pdf = pdfium.PdfDocument(pdf_source)
+        try:
+            page = pdf[page_index]
+            width, height = page.get_size()
+            textpage = page.get_textpage()
+            chars = _chars(textpage, height)
+            textpage.close()
+            page.close()
+            page_count = len(pdf)
+        finally:
+            pdf.close()
+
+    lines = _lines(_words(chars))
+    info = {'chars': sum(1 for char in chars if char[0] != ' '), 'page_count': page_count,
+            'width': width, 'height': height}
+    header = next((line for line in lines if any(HEADER_KEY in word[0] for word in line)), None)
+    if header is None:
+        return None, info
+
+    # Column boundaries halfway between header cell centres: numbers sit right-aligned
+    # and names left-aligned in their cells, both well inside these bounds
+    centres = [(word[1] + word[2]) / 2 for word in header]
+    bounds = [(a + b) / 2 for a, b in zip(centres, centres[1:])]
+    table = []
+    for line in lines[lines.index(header):]:
+        cells = [[] for _ in centres]
+        for text, x0, x1, v_mid in line:
+            mid = (x0 + x1) / 2
+            cells[sum(mid > bound for bound in bounds)].append(text)
+        table.append([' '.join(cell) if cell else None for cell in cells])
+        if any(TOTAL_KEY in word[0] for word in line):
+            break
+    return table, info
@@ -0,0 +1,233 @@
+"""
+Image preprocessing for the full-resolution OCR pass, on NumPy arrays.
+
+Tesseract thresholds and cleans up whatever it is given; handing it a noisy 8-bit
+(or RGB) page costs its own conversion plus a large image to encode and read.
+preprocess() runs the configured steps and returns a compact image:
+
+- 'grayscale': RGB -> 8-bit luma (a no-op for grayscale renders)
+- 'binarize':  adaptive (local mean) threshold, robust to uneven scanner lighting;
+               the result is handed over as a 1-bit image
+- 'deskew':    straightens a page fed in a few degrees crooked (projection profile
+               search, applied as a column and a row shear)
+- 'trim':      drops blank margins around the ink
+
+Steps come from WEEKLY_REPORT_OCR_PREPROCESS (comma separated, empty for none).
+"""
+import math
+import os
+
+import numpy as np
+from PIL import Image
+
+STEPS = ('grayscale', 'binarize', 'deskew', 'trim')
+DEFAULT_STEPS = tuple(step for step in os.environ.get('WEEKLY_REPORT_OCR_PREPROCESS', ','.join(STEPS)).split(',')
+                      if step)
+
+# Adaptive threshold: a pixel is ink if darker than its neighbourhood mean by this fraction,
+# the neighbourhood being BINARIZE_WINDOW of the page width across (measured at 1/BINARIZE_REDUCE size)
+BINARIZE_OFFSET = 0.15
+BINARIZE_WINDOW = 1 / 64
+BINARIZE_REDUCE = 4
+# Ink pixels with fewer ink pixels than this in their 3x3 block are scanner speckle
+# (a 1px ruling line still has 3)
+SPECKLE_MIN = 3
+# Skew search range and step (degrees), on every SKEW_SAMPLE-th pixel
+MAX_SKEW = 3.0
+SKEW_STEP = 0.1
+SKEW_SAMPLE = 4
+# Below this the page is left as it is (0.2 degrees drifts < 8px across a 300dpi table)
+MIN_SKEW = 0.2
+# Trim: rows/columns with more than this fraction of ink count, averaged over TRIM_SMOOTH
+# of the size (a stray streak is not content); TRIM_PAD of the size is kept
+TRIM_INK_MIN = 0.005
+TRIM_SMOOTH = 0.005
+TRIM_PAD = 0.01
+
+PAPER = 255
+
+
+def to_array(image):
+    """
+    PIL image or array -> 2-D uint8 gray or 3-D RGB array (no copy for arrays and 'L' images).
+    """
+    if isinstance(image, np.ndarray):
+        return image
+    if image.mode not in ('L', 'RGB'):
+        image = image.convert('RGB' if image.mode in ('RGBA', 'P', 'CMYK') else 'L')
+    return np.asarray(image)
+
+
+def grayscale(arr):
+    if arr.ndim == 2:
+        return arr
+    # ITU-R 601 luma, as PIL's convert('L'), in integer arithmetic
+    rgb = arr[..., :3].astype(np.uint16)
+    return ((rgb[..., 0] * 299 + rgb[..., 1] * 587 + rgb[..., 2] * 114 + 500) // 1000).astype(np.uint8)
+
+
+def _box_mean(gray, radius):
+    # Mean over a (2r+1)^2 window, edges replicated; two cumulative sums in int32
+    size = 2 * radius + 1
+    padded = np.pad(gray, radius, mode='edge').astype(np.int32)
+    c = np.cumsum(padded, axis=1)
+    rows = c[:, size - 1:].copy()
+    rows[:, 1:] -= c[:, :-size]
+    c = np.cumsum(rows, axis=0)
+    sums = c[size - 1:].copy()
+    sums[1:] -= c[:-size]
+    return sums / (size * size)
+
+
+def _local_threshold(gray, offset, window):
+    # The local mean changes slowly: computed on a reduced copy, scaled back up as uint8
+    f = BINARIZE_REDUCE
+    height, width = gray.shape
+    h, w = max(1, height // f), max(1, width // f)
+    small = gray[:h * f, :w * f].reshape(h, f, w, f).mean(axis=(1, 3)) if height >= f and width >= f else gray
+    f = f if small is not gray else 1
+    radius = max(2, int(width * window) // (2 * f))
+    threshold = (_box_mean(small, radius) * (1 - offset)).astype(np.uint8)
+    threshold = np.repeat(np.repeat(threshold, f, axis=0), f, axis=1)
+    return np.pad(threshold, ((0, height - threshold.shape[0]), (0, width - threshold.shape[1])), mode='edge')
+
+
+def binarize(gray, offset=BINARIZE_OFFSET, window=BINARIZE_WINDOW, speckle_min=SPECKLE_MIN):
+    """
+    Ink (0) / paper (255) by comparing each pixel with its local mean; isolated
+    speckles are dropped.
+    """
+    ink = gray < _local_threshold(gray, offset, window)
+    if speckle_min > 1:
+        ink &= _neighbours(ink) >= speckle_min
+    # uint8 operands, so no int64 page is built on the way
+    return np.where(ink, np.uint8(0), np.uint8(PAPER))
+
+
+def _neighbours(ink):
+    # Ink pixels in each 3x3 block (itself included), as nine shifted uint8 adds
+    padded = np.pad(ink.view(np.uint8), 1)
+    height, width = ink.shape
+    count = np.zeros((height, width), np.uint8)
+    for dy in range(3):
+        for dx in range(3):
+            count += padded[dy:dy + height, dx:dx + width]
+    return count
+
+
+def _ink(gray):
+    return gray < 128
+
+
+def estimate_skew(gray, max_angle=MAX_SKEW, step=SKEW_STEP):
+    """
+    Skew in degrees, counter-clockwise (PIL's rotate convention): the column shear that
+    gives the sharpest row profile of the ink.
+    """
+    ink = _ink(gray[::SKEW_SAMPLE, ::SKEW_SAMPLE])
+    ys, xs = np.nonzero(ink)
+    if len(ys) < 100:
+        return 0.0
+    xs = xs - ink.shape[1] / 2
+    best, best_score = 0.0, -1.0
+    for angle in np.arange(-max_angle, max_angle + step / 2, step):
+        rows = np.round(ys + xs * math.tan(math.radians(angle))).astype(np.int64)
+        profile = np.bincount(rows - rows.min())
+        score = float(np.dot(profile, profile))
+        if score > best_score:
+            best, best_score = float(angle), score
+    return round(best, 2)
+
+
+def _shear(arr, slope):
+    # Shifts column x down by (x - centre) * slope pixels, one run of equal shift at a time
+    height, width = arr.shape
+    shifts = np.round((np.arange(width) - width / 2) * slope).astype(np.int64)
+    out = np.full_like(arr, PAPER)
+    edges = np.flatnonzero(np.diff(shifts)) + 1
+    for x0, x1 in zip(np.concatenate([[0], edges]), np.concatenate([edges, [width]])):
+        shift = int(shifts[x0])
+        if abs(shift) >= height:
+            continue
+        if shift >= 0:
+            out[shift:, x0:x1] = arr[:height - shift, x0:x1]
+        else:
+            out[:shift, x0:x1] = arr[-shift:, x0:x1]
+    return out
+
+
+def deskew(gray, angle=None):
+    """
+    Straightens gray with two shears, columns then rows (for a few degrees the same
+    as a rotation, without resampling). Returns (array, angle used).
+    """
+    if angle is None:
+        angle = estimate_skew(gray)
+    if abs(angle) < MIN_SKEW:
+        return gray, 0.0
+    slope = math.tan(math.radians(angle))
+    out = _shear(gray, slope)
+    return _shear(out.T, -slope).T, angle
+
+
+def _smooth(profile, size):
+    if size <= 1:
+        return profile
+    return np.convolve(profile, np.full(size, 1 / size), mode='same')
+
+
+def trim_box(gray, ink_min=TRIM_INK_MIN, pad=TRIM_PAD):
+    """
+    (left, top, right, bottom) around the rows and columns holding ink, padded; None if blank.
+    """
+    ink = _ink(gray)
+    height, width = ink.shape
+    rows = np.flatnonzero(_smooth(ink.mean(axis=1), int(height * TRIM_SMOOTH)) > ink_min)
+    cols = np.flatnonzero(_smooth(ink.mean(axis=0), int(width * TRIM_SMOOTH)) > ink_min)
+    if not len(rows) or not len(cols):
+        return None
+    pad_y, pad_x = int(height * pad), int(width * pad)
+    return (int(max(0, cols[0] - pad_x)), int(max(0, rows[0] - pad_y)),
+            int(min(width, cols[-1] + 1 + pad_x)), int(min(height, rows[-1] + 1 + pad_y)))
+
+
+def to_image(arr, bits=8):
+    """
+    Array -> PIL image: 'L' for 8 bits, packed '1' for 1 bit (ink = 0).
+    """
+    if bits == 1:
+        height, width = arr.shape
+        return Image.frombytes('1', (width, height), np.packbits(arr > 127, axis=1).tobytes())
+    return Image.fromarray(np.ascontiguousarray(arr))
+
+
+def preprocess(image, steps=DEFAULT_STEPS):
+    """
+    Runs steps (a subset of STEPS, applied in STEPS order) on a PIL image or array.
+    Returns (PIL image for OCR, info): 1-bit if binarized, else 8-bit gray (or the
+    RGB input if 'grayscale' is off and nothing else ran). info has the skew angle
+    and the trim box.
+    """
+    unknown = set(steps) - set(STEPS)
+    if unknown:
+        raise ValueError(f"Unknown preprocessing steps: {sorted(unknown)}")
+    if 'grayscale' in steps and isinstance(image, Image.Image) and image.mode == 'RGB':
+        # PIL's own conversion is several times faster than the array one
+        image = image.convert('L')
+    arr = to_array(image)
+    info = {'steps': [step for step in STEPS if step in steps], 'skew': 0.0, 'trim': None}
+    if not info['steps']:
+        return image if not isinstance(image, np.ndarray) else to_image(arr), info
+    if 'grayscale' in steps or arr.ndim == 3:
+        # The other steps work on gray
+        arr = grayscale(arr)
+    if 'binarize' in steps:
+        arr = binarize(arr)
+    if 'deskew' in steps:
+        arr, info['skew'] = deskew(arr)
+    if 'trim' in steps:
+        info['trim'] = trim_box(arr)
+        if info['trim'] is not None:
+            left, top, right, bottom = info['trim']
+            arr = arr[top:bottom, left:right]
+    return to_image(arr, bits=1 if 'binarize' in steps else 8), info
@@ -0,0 +1,100 @@
+"""
+Page rasterization for OCR, straight from pypdfium2.
+
+page.to_image() renders through pdfplumber: a colour (BGRx) bitmap turned into an
+RGB PIL image, which the OCR path then converted to grayscale, rotated and cropped,
+each step a full-page copy. PageRenderer asks pdfium for exactly what OCR needs:
+an 8-bit grayscale bitmap at the chosen dpi, already rotated, optionally only a
+clip rectangle of the page. The result is a NumPy view of the bitmap buffer (one
+allocation, owned by Python, rows packed), which src.preprocess works on directly.
+"""
+import math
+
+import pypdfium2 as pdfium
+
+# pdfium is not thread-safe; one lock with the text-layer path
+from src.pdfium_text import _lock
+
+# Rendering flags as pdfplumber's to_image() (antialias=False), so OCR sees the same pixels
+RENDER_FLAGS = {'no_smoothtext': True, 'no_smoothpath': True, 'no_smoothimage': True}
+
+
+def page_source(page):
+    """
+    What pdfium opens for a pdfplumber page: the file path, else the stream.
+    """
+    if page.pdf.path:
+        return page.pdf.path
+    page.pdf.stream.seek(0)
+    return page.pdf.stream
+
+
+class PageRenderer:
+    """
+    One page of a PDF kept open in pdfium for several renders (the orientation
+    probe, then the table at full resolution). pdf_source is a path, bytes or a
+    binary file object; use as a context manager or close().
+    """
+
+    def __init__(self, pdf_source, page_index=0, password=None):
+        with _lock:
+            self._pdf = pdfium.PdfDocument(pdf_source, password=password)
+            try:
+                self._page = self._pdf[page_index]
+                self.width, self.height = self._page.get_size()
+            except Exception:
+                self._pdf.close()
+                raise
+
+    @classmethod
+    def for_page(cls, page):
+        """
+        Renderer for a pdfplumber page.
+        """
+        return cls(page_source(page), page.page_number - 1, page.pdf.password)
+
+    def size(self, rotate=0):
+        # Page size in points once rotated
+        return (self.height, self.width) if rotate % 180 else (self.width, self.height)
+
+    def render(self, dpi, clip=None, rotate=0):
+        """
+        The page as a 2-D uint8 grayscale array at dpi.
+        rotate turns the page counter-clockwise (degrees, a multiple of 90, as PIL's
+        Image.rotate); clip (x0, top, x1, bottom) in points on the rotated page keeps
+        only that rectangle.
+        """
+        if rotate % 90:
+            raise ValueError(f"Rotation must be a multiple of 90 degrees: {rotate}")
+        width, height = self.size(rotate)
+        crop = (0, 0, 0, 0)
+        if clip is not None:
+            x0, top, x1, bottom = (max(0.0, clip[0]), max(0.0, clip[1]), min(width, clip[2]), min(height, clip[3]))
+            if x1 <= x0 or bottom <= top:
+                raise ValueError(f"Clip {clip} is outside the page")
+            # pdfium crops (left, bottom, right, top) off the borders of the rotated page;
+            # it rounds up, so shave a hair off to keep the edges of the clip
+            eps = 0.5 * 72 / dpi
+            crop = tuple(max(0.0, v - eps) for v in (x0, height - bottom, width - x1, top))
+        with _lock:
+            # pdfium rotates clockwise
+            bitmap = self._page.render(scale=dpi / 72, rotation=(360 - rotate) % 360, crop=crop,
+                                       grayscale=True, **RENDER_FLAGS)
+        # A view on the bitmap's Python-allocated buffer, which it keeps alive
+        return bitmap.to_numpy()
+
+    def close(self):
+        with _lock:
+            self._page.close()
+            self._pdf.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def pixels(width_pt, height_pt, dpi):
+    # Pixel size of a render, as pdfium computes it
+    return math.ceil(width_pt * dpi / 72), math.ceil(height_pt * dpi / 72)
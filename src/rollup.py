@@ -0,0 +1,163 @@
+"""
+Precomputed per-day, per-zone rollups for arbitrary date-range summaries.
+
+RollupEngine sums the daily rows into a (zone x calendar day) grid of Sales,
+Last_Year_Sales, Count, Last_Year_Count and row counts, then keeps running
+(prefix) sums along the day axis. Any inclusive date range is two lookups per
+zone instead of a rescan of the raw rows.
+
+Sales/Count/row prefixes are int64 and exact. The last-year prefixes are kept as
+compensated double-double sums (hi + lo), so a range difference is as accurate as
+summing the range directly; the weighted YoY comes out of the same
+summarize_zone_sums() that calculate_weekly_summary uses.
+"""
+import numpy as np
+import pandas as pd
+
+from src import schema
+from src.aggregator import SUM_COLUMNS, get_last_year, summarize_zone_sums
+
+
+def _two_sum(a, b):
+    # Error-free transformation: a + b == s + err exactly
+    s = a + b
+    bb = s - a
+    err = (a - (s - bb)) + (b - bb)
+    return s, err
+
+
+class RollupEngine:
+
+    def __init__(self, daily_df):
+        """
+        daily_df: typed rows (see src.schema), e.g. HistoryStore.read_range().
+        Rows with Status 'error' or no date are ignored.
+        """
+        if 'Status' in daily_df.columns:
+            daily_df = daily_df[daily_df['Status'] == schema.STATUS_OK]
+        daily_df = daily_df[daily_df['Date'].notna()]
+
+        if daily_df.empty:
+            self.first_day = self.last_day = None
+            self.zones = pd.Index([], dtype=object, name='Zone')
+            return
+
+        self.first_day = daily_df['Date'].min().normalize()
+        self.last_day = daily_df['Date'].max().normalize()
+        n_days = (self.last_day - self.first_day).days + 1
+
+        zone_codes, zones = pd.factorize(daily_df['Zone'].astype(object), sort=True)  # groupby order
+        self.zones = pd.Index(zones, dtype=object, name='Zone')
+        day_idx = (daily_df['Date'].dt.normalize() - self.first_day).dt.days.to_numpy()
+        shape = (len(zones), n_days)
+
+        def grid(values, dtype):
+            out = np.zeros(shape, dtype=dtype)
+            np.add.at(out, (zone_codes, day_idx), values)
+            return out
+
+        # Integer metrics: plain prefix sums are exact
+        self._int_prefix = {}
+        for col, values in [('Sales', daily_df['Sales']), ('Count', daily_df['Count']),
+                            ('Rows', np.ones(len(daily_df), dtype=np.int64))]:
+            daily = grid(np.asarray(values, dtype=np.int64), np.int64)
+            self._int_prefix[col] = np.concatenate([np.zeros((shape[0], 1), np.int64), daily.cumsum(axis=1)], axis=1)
+
+        # Last-year metrics: compensated prefix sums
+        self._float_prefix = {}
+        for col, current, yoy in [('Last_Year_Sales', 'Sales', 'Sales_YoY'), ('Last_Year_Count', 'Count', 'Count_YoY')]:
+            daily = grid(get_last_year(daily_df[current], daily_df[yoy]), np.float64)
+            hi = np.zeros((shape[0], n_days + 1))
+            lo = np.zeros((shape[0], n_days + 1))
+            for d in range(n_days):
+                hi[:, d + 1], err = _two_sum(hi[:, d], daily[:, d])
+                lo[:, d + 1] = lo[:, d] + err
+            self._float_prefix[col] = (hi, lo)
+
+    def _bounds(self, start, end):
+        start = self.first_day if start is None else max(pd.Timestamp(start).normalize(), self.first_day)
+        end = self.last_day if end is None else min(pd.Timestamp(end).normalize(), self.last_day)
+        return (start - self.first_day).days, (end - self.first_day).days + 1
+
+    def zone_sums(self, start=None, end=None):
+        """
+        Per-zone sums for start <= Date <= end (inclusive), like aggregator.zone_sums on those rows.
+        """
+        empty = pd.DataFrame(columns=SUM_COLUMNS, index=self.zones[:0])
+        if self.first_day is None:
+            return empty
+        s, e = self._bounds(start, end)
+        if s >= e:
+            return empty
+
+        sums = {}
+        for col, prefix in self._int_prefix.items():
+            sums[col] = prefix[:, e] - prefix[:, s]
+        for col, (hi, lo) in self._float_prefix.items():
+            head, err = _two_sum(hi[:, e], -hi[:, s])
+            sums[col] = head + (err + (lo[:, e] - lo[:, s]))
+
+        df = pd.DataFrame(sums, index=self.zones)
+        # Only zones that actually have rows in the range, as a groupby would give
+        return df[df.pop('Rows') > 0][SUM_COLUMNS]
+
+    def summary(self, start=None, end=None):
+        """
+        Same table as calculate_weekly_summary(rows between start and end).
+        """
+        sums = self.zone_sums(start, end)
+        if sums.empty:
+            return pd.DataFrame()
+        return summarize_zone_sums(sums)
+
+    def month_to_date_range(self, as_of=None):
+        # (first of the month, as_of); as_of defaults to the last day with data
+        as_of = self.last_day if as_of is None else pd.Timestamp(as_of)
+        return as_of.replace(day=1), as_of
+
+    def month_to_date(self, as_of=None):
+        return self.summary(*self.month_to_date_range(as_of))
+
+    def rolling_range(self, as_of=None, weeks=4):
+        # The `weeks` * 7 days ending on as_of (default: the last day with data)
+        as_of = self.last_day if as_of is None else pd.Timestamp(as_of)
+        return as_of - pd.Timedelta(days=7 * weeks - 1), as_of
+
+    def rolling(self, as_of=None, weeks=4):
+        return self.summary(*self.rolling_range(as_of, weeks))
+
+    def weekly(self, start=None, end=None, zone=None):
+        """
+        One summary row per 7-day block from start (default: first day), for one zone
+        (default: the first row of each summary, i.e. the PSP total).
+        """
+        if self.first_day is None:
+            return pd.DataFrame()
+        start = self.first_day if start is None else pd.Timestamp(start)
+        end = self.last_day if end is None else pd.Timestamp(end)
+        rows = []
+        week_start = start
+        while week_start <= end:
+            week_end = min(week_start + pd.Timedelta(days=6), end)
+            summary = self.summary(week_start, week_end)
+            if not summary.empty:
+                row = summary[summary['Zone'] == zone] if zone is not None else summary.head(1)
+                if not row.empty:
+                    rows.append(row.assign(Week_Start=week_start, Week_End=week_end))
+            week_start += pd.Timedelta(days=7)
+        return pd.concat(rows, ignore_index=True) if rows else pd.DataFrame()
+
+    def year_over_year(self, start, end):
+        """
+        The range next to the same calendar range one year earlier (from stored history,
+        not from the YoY columns printed in the report). The ratio is NaN where there is
+        nothing to compare with (no rows or a zero a year earlier, e.g. a new zone).
+        """
+        start, end = pd.Timestamp(start), pd.Timestamp(end)
+        current = self.zone_sums(start, end)[['Sales', 'Count']]
+        previous = self.zone_sums(start - pd.DateOffset(years=1), end - pd.DateOffset(years=1))[['Sales', 'Count']]
+        joined = current.join(previous, how='left', rsuffix='_Prev_Year')
+        for col in ['Sales', 'Count']:
+            previous_year = joined[f'{col}_Prev_Year']
+            joined[f'{col}_YoY_History'] = (joined[col] / previous_year.where(previous_year != 0) * 100).round(1)
+        return joined.reset_index()
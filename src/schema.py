@@ -0,0 +1,92 @@
+"""
+Typed column layout shared by the extractor output and everything downstream.
+
+Date is a real datetime64 (midnight), Zone a category, Sales/Count integers and the
+YoY percentages float32. Failed files are marked with Status == 'error' and a
+message in Error, instead of an 'ERR:' prefix in Zone.
+"""
+import pandas as pd
+
+STATUS_OK = 'ok'
+STATUS_ERROR = 'error'
+
+DTYPES = {
+    'Date': 'datetime64[ns]',
+    'Zone': 'category',
+    'Sales': 'int64',
+    'Sales_YoY': 'float32',
+    'Count': 'int32',
+    'Count_YoY': 'float32',
+    'Page': 'Int16',  # page of the PDF the row came from; <NA> for manual and stored rows
+    'Status': pd.CategoricalDtype([STATUS_OK, STATUS_ERROR]),
+    'Error': 'object',
+}
+COLUMNS = list(DTYPES)
+
+
+def parse_date(value):
+    """
+    'YYYYMMDD' (or anything pandas understands) -> Timestamp; NaT if it is not a date.
+    """
+    if isinstance(value, str):
+        return pd.to_datetime(value.strip(), format='%Y%m%d', errors='coerce')
+    return pd.to_datetime(value, errors='coerce')
+
+
+def coerce(df):
+    """
+    Returns df with exactly the schema columns and dtypes (missing columns are filled).
+    """
+    df = df.copy()
+    if 'Status' not in df.columns:
+        df['Status'] = STATUS_OK
+    if 'Error' not in df.columns:
+        df['Error'] = None
+    if 'Page' not in df.columns:
+        df['Page'] = pd.NA
+    for col in ['Sales', 'Count']:
+        df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
+    if df['Date'].dtype == object:
+        df['Date'] = pd.to_datetime(df['Date'].astype(str).str.strip(), format='%Y%m%d', errors='coerce')
+    df['Zone'] = df['Zone'].astype(object)  # let astype('category') rebuild the categories
+    return df[COLUMNS].astype(DTYPES)
+
+
+def extracted_frame(rows):
+    """
+    Builds a typed frame from extractor row dicts (Date as 'YYYYMMDD').
+    """
+    if not rows:
+        return pd.DataFrame({col: pd.Series(dtype=dtype) for col, dtype in DTYPES.items()})
+    return coerce(pd.DataFrame(rows))
+
+
+def error_frame(date_str, message):
+    """
+    Single placeholder row for a file nothing could be extracted from.
+    """
+    return extracted_frame([{
+        'Date': date_str, 'Zone': None,
+        'Sales': 0, 'Sales_YoY': 0.0, 'Count': 0, 'Count_YoY': 0.0,
+        'Status': STATUS_ERROR, 'Error': message,
+    }])
+
+
+def concat(frames):
+    """
+    pd.concat that keeps Zone categorical even when the inputs have different categories.
+    """
+    frames = [df for df in frames if df is not None and not df.empty]
+    if not frames:
+        return extracted_frame([])
+    combined = pd.concat(frames, ignore_index=True)
+    if combined['Zone'].dtype != 'category':
+        combined['Zone'] = combined['Zone'].astype('category')
+    return combined
+
+
+def format_date(dates):
+    """
+    Dates back to the 'YYYYMMDD' form used in filenames and the UI.
+    """
+    return dates.dt.strftime('%Y%m%d')
@@ -0,0 +1,158 @@
+import datetime
+import os
+import sqlite3
+from contextlib import contextmanager
+
+import pandas as pd
+
+from src import schema
+
+DEFAULT_STORE_PATH = os.environ.get(
+    'WEEKLY_REPORT_STORE',
+    os.path.join(os.path.expanduser('~'), '.weekly-report', 'history.sqlite3')
+)
+
+MANUAL_SOURCE = 'manual'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS zone_rows (
+    date TEXT NOT NULL,
+    zone TEXT NOT NULL,
+    source TEXT NOT NULL,
+    sales INTEGER NOT NULL,
+    sales_yoy REAL NOT NULL,
+    count INTEGER NOT NULL,
+    count_yoy REAL NOT NULL,
+    ingested_at TEXT NOT NULL,
+    PRIMARY KEY (date, zone, source)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS zone_rows_source ON zone_rows (source);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+
+class HistoryStore:
+    """
+    Append-only local history of daily zone rows (SQLite, no server).
+
+    Rows are clustered by date (WITHOUT ROWID table keyed on date, zone, source),
+    so a date-range read only touches that range. A source is the content hash of
+    the PDF the rows came from, or 'manual' for corrections typed into the app.
+    Re-ingesting a source replaces its rows, so the same PDF never counts twice.
+    When several sources cover one date, reads use the manual entry if present,
+    otherwise the most recently ingested source.
+    """
+
+    def __init__(self, path=DEFAULT_STORE_PATH):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        # One short-lived connection per call keeps the store safe to use from worker threads
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            with conn:  # commit on success, roll back on error
+                yield conn
+        finally:
+            conn.close()
+
+    def has_source(self, source):
+        with self._connect() as conn:
+            return conn.execute("SELECT 1 FROM zone_rows WHERE source = ? LIMIT 1", (source,)).fetchone() is not None
+
+    def add_rows(self, df, source):
+        """
+        Stores the valid rows of one extracted file under `source`. Error rows are skipped.
+        Returns the number of rows written.
+        """
+        if df is None or df.empty:
+            return 0
+        valid = df[(df['Status'] == schema.STATUS_OK) & df['Date'].notna()]
+        now = datetime.datetime.now().isoformat(timespec='seconds')
+        records = [
+            (date.strftime('%Y-%m-%d'), str(zone), source, int(sales), float(sales_yoy), int(count), float(count_yoy), now)
+            for date, zone, sales, sales_yoy, count, count_yoy in zip(
+                valid['Date'], valid['Zone'], valid['Sales'], valid['Sales_YoY'], valid['Count'], valid['Count_YoY'])
+        ]
+        if not records:
+            # Nothing to store (a failed file): no write, so the version stays as it is
+            return 0
+        with self._connect() as conn:
+            conn.execute("DELETE FROM zone_rows WHERE source = ?", (source,))
+            conn.executemany("INSERT OR REPLACE INTO zone_rows VALUES (?, ?, ?, ?, ?, ?, ?, ?)", records)
+            self._count_write(conn)
+        return len(records)
+
+    def add_manual(self, entry):
+        """
+        Stores one manual correction (a dict in the extractor row format).
+        It replaces any earlier manual entry for the same date and zone.
+        """
+        date = schema.parse_date(entry['Date'])
+        if pd.isna(date):
+            raise ValueError(f"Invalid date: {entry['Date']!r}")
+        now = datetime.datetime.now().isoformat(timespec='seconds')
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO zone_rows VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (date.strftime('%Y-%m-%d'), entry['Zone'], MANUAL_SOURCE, int(entry['Sales']),
+                 float(entry['Sales_YoY']), int(entry['Count']), float(entry['Count_YoY']), now)
+            )
+            self._count_write(conn)
+
+    def _count_write(self, conn):
+        # In the writing transaction, so version() never lags the rows
+        conn.execute("INSERT INTO meta VALUES ('writes', 1) "
+                     "ON CONFLICT (key) DO UPDATE SET value = value + 1")
+
+    def read_range(self, start=None, end=None):
+        """
+        Rows for start <= Date <= end (inclusive; None means open-ended), one source per date,
+        as a typed frame ready for calculate_weekly_summary.
+        """
+        start = pd.Timestamp(start).strftime('%Y-%m-%d') if start is not None else '0000-00-00'
+        end = pd.Timestamp(end).strftime('%Y-%m-%d') if end is not None else '9999-99-99'
+        query = """
+            WITH sources AS (
+                SELECT date, source, MAX(ingested_at) AS ingested_at
+                FROM zone_rows WHERE date BETWEEN ? AND ?
+                GROUP BY date, source
+            ), chosen AS (
+                SELECT date, source FROM (
+                    SELECT date, source, ROW_NUMBER() OVER (
+                        PARTITION BY date ORDER BY source = ? DESC, ingested_at DESC, source
+                    ) AS rn
+                    FROM sources
+                ) WHERE rn = 1
+            )
+            SELECT r.date, r.zone, r.sales, r.sales_yoy, r.count, r.count_yoy
+            FROM zone_rows r JOIN chosen c ON r.date = c.date AND r.source = c.source
+            ORDER BY r.date, r.zone
+        """
+        with self._connect() as conn:
+            df = pd.read_sql_query(query, conn, params=(start, end, MANUAL_SOURCE))
+        df.columns = ['Date', 'Zone', 'Sales', 'Sales_YoY', 'Count', 'Count_YoY']
+        df['Date'] = pd.to_datetime(df['Date'], format='%Y-%m-%d')
+        return schema.coerce(df)
+
+    def version(self):
+        """
+        Changes whenever rows are added or replaced; use it as a cache key for derived data.
+        A write counter, so two writes within the same second still give different versions.
+        """
+        with self._connect() as conn:
+            row = conn.execute("SELECT value FROM meta WHERE key = 'writes'").fetchone()
+            return row[0] if row else 0
+
+    def dates(self):
+        with self._connect() as conn:
+            rows = conn.execute("SELECT DISTINCT date FROM zone_rows ORDER BY date").fetchall()
+        return [pd.Timestamp(row[0]) for row in rows]
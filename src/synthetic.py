@@ -0,0 +1,277 @@
+"""
+Synthetic 【ゾーン別】売上実績 report generator.
+
+Writes zone-sales PDFs in the layouts extract_from_pdf has to cope with, without
+needing the real (unshareable) daily reports:
+
+- 'ruled':      text layer + ruled table lines (default extract_table strategy)
+- 'borderless': text layer only (text-strategy table / raw text fallback)
+- 'scan':       image-only page rendered from the text layer (OCR path), optionally rotated
+- 'multipage':  ruled table split over three pages (header on the first only) plus a notes page
+- 'footer':     ruled table with the printout's 出力日時 (printed at) line below it
+
+Text uses the non-embedded HeiseiKakuGo-W5 CID font, so no font files are needed to
+write or parse the text layer. Scans are rasterized with pypdfium2, which substitutes a
+system font; install a Japanese font (e.g. fonts-noto-cjk) for OCR-readable scans.
+
+    python -m src.synthetic OUT_DIR [--days 7] [--start 20260126]
+"""
+import argparse
+import datetime
+import io
+import json
+import os
+import random
+
+PAGE_WIDTH, PAGE_HEIGHT = 595, 842  # A4 portrait, points
+FONT_SIZE = 9
+ROW_HEIGHT = 16
+COLUMN_X = [40, 200, 260, 360, 420, 500, 555]  # 6 columns: zone, code, sales, yoy, count, yoy
+HEADER = ['ブロック／業種', 'コード', '純売上高', '前年比', '客数', '前年比']
+
+ZONES = [
+    '【Ａブロック】食品', '【Ａブロック】雑貨', '【Ｂブロック】衣料', '【Ｂブロック】靴・バッグ',
+    '【Ｃブロック】飲食', '【Ｃブロック】スポーツ', '【Ｄブロック】アウトドア', '【Ｄブロック】キッズ',
+    '【Ｅブロック】ファッション', '【Ｅブロック】インテリア',
+]
+PSP_TOTAL = '【軽井沢ＰＳＰ 計】'
+GRAND_TOTAL = '【総合計】'
+
+STYLES = ['ruled', 'borderless', 'scan', 'multipage', 'footer']
+
+
+def make_report_rows(date_str, seed=None):
+    """
+    Ground-truth rows for one day: zones, the duplicated 准合計 subtotal, PSP total and grand total.
+    """
+    rng = random.Random(seed if seed is not None else date_str)
+    rows = []
+    for zone in ZONES:
+        sales = rng.randint(200_000, 9_000_000)
+        count = rng.randint(50, 4_000)
+        # New zones have no last-year figures; the report prints '-'
+        sales_yoy = 0.0 if rng.random() < 0.05 else round(rng.uniform(60, 160), 1)
+        count_yoy = 0.0 if sales_yoy == 0.0 else round(rng.uniform(60, 160), 1)
+        rows.append({'Zone': zone, 'Sales': sales, 'Sales_YoY': sales_yoy, 'Count': count, 'Count_YoY': count_yoy})
+
+    def total(name):
+        sales = sum(r['Sales'] for r in rows if r['Zone'] in ZONES)
+        count = sum(r['Count'] for r in rows if r['Zone'] in ZONES)
+        ly_sales = sum(r['Sales'] / (r['Sales_YoY'] / 100) for r in rows if r['Zone'] in ZONES and r['Sales_YoY'])
+        ly_count = sum(r['Count'] / (r['Count_YoY'] / 100) for r in rows if r['Zone'] in ZONES and r['Count_YoY'])
+        return {'Zone': name, 'Sales': sales, 'Sales_YoY': round(sales / ly_sales * 100, 1),
+                'Count': count, 'Count_YoY': round(count / ly_count * 100, 1)}
+
+    rows.append(total('准合計'))
+    rows.append(total(PSP_TOTAL))
+    rows.append(total(GRAND_TOTAL))
+    _check_parseable(rows)
+    return rows
+
+
+def _check_parseable(rows):
+    # A row the OCR parser takes for a repeated header line would be skipped on every
+    # scan, capping scan accuracy without any error
+    from src.extractor import is_ocr_header_line
+
+    clashing = [row['Zone'] for row in rows if is_ocr_header_line(row['Zone'], header_found=True)]
+    if clashing:
+        raise ValueError(f"Zone names read as the OCR header line: {clashing}")
+
+
+def _fmt_int(value):
+    return f"{value:,}" if value >= 0 else f"△{-value:,}"
+
+
+def _fmt_yoy(value):
+    return '-' if value == 0 else f"{value:.1f}"
+
+
+def _text_width(text, size=FONT_SIZE):
+    # Widths declared in the font dictionary: ASCII 500, everything else 1000 (per mille)
+    return sum(500 if ord(ch) < 0x80 else 1000 for ch in text) * size / 1000
+
+
+def _show_text(x, y, text, size=FONT_SIZE):
+    # UniJIS-UCS2-H takes UCS-2 big-endian code units
+    return f"BT /F1 {size} Tf 1 0 0 1 {x:.2f} {y:.2f} Tm <{text.encode('utf-16-be').hex()}> Tj ET\n"
+
+
+def _content_stream(date_str, rows, ruled, title=True, header=True, first_index=0, footer=False):
+    out = []
+    if title:
+        out.append(_show_text(40, PAGE_HEIGHT - 50, f"SHO00200  ゾーン別売上実績  {date_str}", 12))
+
+    table_rows = ([HEADER] if header else []) + [
+        [r['Zone'], f"{first_index + i + 1:03d}", _fmt_int(r['Sales']), _fmt_yoy(r['Sales_YoY']),
+         _fmt_int(r['Count']), _fmt_yoy(r['Count_YoY'])]
+        for i, r in enumerate(rows)
+    ]
+    top = PAGE_HEIGHT - 80
+    bottom = top - len(table_rows) * ROW_HEIGHT
+    if footer:
+        printed = f"{date_str[:4]}/{date_str[4:6]}/{date_str[6:]} 09:12"
+        out.append(_show_text(COLUMN_X[0] + 3, bottom - 2 * ROW_HEIGHT, f"出力日時 {printed}"))
+    for i, cells in enumerate(table_rows):
+        baseline = top - (i + 1) * ROW_HEIGHT + 4
+        for col, cell in enumerate(cells):
+            if col == 0:
+                x = COLUMN_X[col] + 3
+            else:
+                # Right-align numbers (and their headings) like the real report
+                x = COLUMN_X[col + 1] - 3 - _text_width(cell)
+            out.append(_show_text(x, baseline, cell))
+
+    if ruled:
+        out.append("0.5 w\n")
+        for i in range(len(table_rows) + 1):
+            y = top - i * ROW_HEIGHT
+            out.append(f"{COLUMN_X[0]} {y} m {COLUMN_X[-1]} {y} l S\n")
+        for x in COLUMN_X:
+            out.append(f"{x} {top} m {x} {bottom} l S\n")
+    return "".join(out).encode('ascii')
+
+
+def _pdf_bytes(objects):
+    """
+    Serializes a list of object bodies (object n is objects[n - 1]) with an xref table.
+    """
+    buf = io.BytesIO()
+    buf.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+    offsets = []
+    for num, body in enumerate(objects, start=1):
+        offsets.append(buf.tell())
+        buf.write(f"{num} 0 obj\n".encode('ascii') + body + b"\nendobj\n")
+    xref = buf.tell()
+    buf.write(f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode('ascii'))
+    for offset in offsets:
+        buf.write(f"{offset:010d} 00000 n \n".encode('ascii'))
+    buf.write(f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode('ascii'))
+    return buf.getvalue()
+
+
+def _notes_stream():
+    return _show_text(40, PAGE_HEIGHT - 50, "備考：数値は税抜、前年比は前年同曜日比です。").encode('ascii')
+
+
+def text_pdf_bytes(date_str, rows, ruled=True, rows_per_page=None, repeat_header=True, notes_page=False,
+                   footer=False):
+    """
+    Text-layer report. rows_per_page splits the table over several pages (the header is
+    repeated on each page unless repeat_header is False); notes_page appends a page of
+    remarks after the table, as some printouts have; footer prints the 出力日時 line
+    under the table on its last page.
+    """
+    rows_per_page = rows_per_page or len(rows)
+    streams = [
+        _content_stream(date_str, rows[start:start + rows_per_page], ruled,
+                        title=(start == 0), header=(start == 0 or repeat_header), first_index=start,
+                        footer=footer and start + rows_per_page >= len(rows))
+        for start in range(0, len(rows), rows_per_page)
+    ]
+    if notes_page:
+        streams.append(_notes_stream())
+
+    # 1-2 catalog and page tree, 3-5 font, then a page object and its content stream per page
+    page_ids = [6 + 2 * i for i in range(len(streams))]
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        f"<< /Type /Pages /Kids [{' '.join(f'{n} 0 R' for n in page_ids)}] /Count {len(streams)} >>".encode('ascii'),
+        b"<< /Type /Font /Subtype /Type0 /BaseFont /HeiseiKakuGo-W5 /Encoding /UniJIS-UCS2-H "
+        b"/DescendantFonts [4 0 R] >>",
+        b"<< /Type /Font /Subtype /CIDFontType0 /BaseFont /HeiseiKakuGo-W5 "
+        b"/CIDSystemInfo << /Registry (Adobe) /Ordering (Japan1) /Supplement 2 >> "
+        b"/FontDescriptor 5 0 R /DW 1000 /W [1 95 500] >>",
+        b"<< /Type /FontDescriptor /FontName /HeiseiKakuGo-W5 /Flags 4 /FontBBox [-92 -250 1010 922] "
+        b"/ItalicAngle 0 /Ascent 880 /Descent -120 /CapHeight 737 /StemV 93 >>",
+    ]
+    for page_id, content in zip(page_ids, streams):
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {PAGE_WIDTH} {PAGE_HEIGHT}] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {page_id + 1} 0 R >>".encode('ascii'))
+        objects.append(f"<< /Length {len(content)} >>\nstream\n".encode('ascii') + content + b"\nendstream")
+    return _pdf_bytes(objects)
+
+
+def scan_pdf_bytes(date_str, rows, rotate=0, dpi=200, noise=0.0, seed=None):
+    """
+    Image-only PDF: the ruled report rasterized at dpi, rotated by `rotate` degrees
+    (counter-clockwise, as a misfed scanner would) and optionally speckled with noise.
+    """
+    import numpy as np
+    import pypdfium2 as pdfium
+    from PIL import Image
+
+    pdf = pdfium.PdfDocument(text_pdf_bytes(date_str, rows, ruled=True))
+    try:
+        img = pdf[0].render(scale=dpi / 72, grayscale=True).to_pil().convert('L')
+    finally:
+        pdf.close()
+
+    if noise:
+        rng = np.random.default_rng(seed)
+        pixels = np.asarray(img).copy()
+        speckle = rng.random(pixels.shape) < noise
+        pixels[speckle] = rng.integers(0, 256, speckle.sum(), dtype=np.uint8)
+        img = Image.fromarray(pixels)
+    if rotate:
+        img = img.rotate(rotate, expand=True, fillcolor=255)
+
+    buf = io.BytesIO()
+    img.save(buf, format='PDF', resolution=dpi)
+    return buf.getvalue()
+
+
+def report_filename(date_str):
+    return f"【ゾーン別】売上実績{date_str}.pdf"
+
+
+def generate_corpus(out_dir, start_date="20260126", days=7, styles=None, scan_rotations=(0, 180, 90), scan_dpi=200):
+    """
+    Writes `days` reports per style into out_dir/<style>/ plus truth.json with the expected rows.
+    Scans cycle through scan_rotations. Returns {path: (style, date_str, rows)}.
+    """
+    styles = styles or STYLES
+    start = datetime.datetime.strptime(start_date, "%Y%m%d")
+    corpus = {}
+    truth = {}
+    for style in styles:
+        style_dir = os.path.join(out_dir, style)
+        os.makedirs(style_dir, exist_ok=True)
+        for day in range(days):
+            date_str = (start + datetime.timedelta(days=day)).strftime("%Y%m%d")
+            rows = make_report_rows(date_str)
+            if style == 'multipage':
+                # 13 rows over 3 pages, header only on the first, then a notes page
+                pdf_bytes = text_pdf_bytes(date_str, rows, ruled=True, rows_per_page=5,
+                                           repeat_header=False, notes_page=True)
+            elif style == 'scan':
+                rotate = scan_rotations[day % len(scan_rotations)]
+                pdf_bytes = scan_pdf_bytes(date_str, rows, rotate=rotate, dpi=scan_dpi, noise=0.002, seed=day)
+            elif style == 'footer':
+                pdf_bytes = text_pdf_bytes(date_str, rows, ruled=True, footer=True)
+            else:
+                pdf_bytes = text_pdf_bytes(date_str, rows, ruled=(style == 'ruled'))
+            path = os.path.join(style_dir, report_filename(date_str))
+            with open(path, 'wb') as f:
+                f.write(pdf_bytes)
+            corpus[path] = (style, date_str, rows)
+            truth[os.path.relpath(path, out_dir)] = rows
+    with open(os.path.join(out_dir, 'truth.json'), 'w', encoding='utf-8') as f:
+        json.dump(truth, f, ensure_ascii=False, indent=1)
+    return corpus
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic zone-sales report PDFs.")
+    parser.add_argument('out_dir')
+    parser.add_argument('--start', default="20260126", help="first report date (YYYYMMDD)")
+    parser.add_argument('--days', type=int, default=7)
+    parser.add_argument('--styles', nargs='+', choices=STYLES, default=STYLES)
+    args = parser.parse_args()
+    corpus = generate_corpus(args.out_dir, args.start, args.days, args.styles)
+    print(f"Wrote {len(corpus)} PDFs to {args.out_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,316 @@
+"""
+Background ingestion of the daily reports from a watched folder.
+
+New 【ゾーン別】売上実績*.pdf files are picked up as they arrive, extracted in a
+small process pool and written to the extraction cache and the history store,
+so the app finds the day already extracted (cache hit on upload, or straight from
+the stored history) by the time anyone opens it.
+
+A file is only extracted once it has settled: no filesystem events and an
+unchanged size/mtime for `settle_seconds`, and a PDF trailer (%%EOF) at the end.
+Copies over SMB or from a scanner are written in several chunks, and reading
+them early would just produce a failed extraction.
+
+    python -m src.watcher INBOX_DIR [--jobs 2] [--settle 5]
+"""
+import argparse
+import fnmatch
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from watchdog.events import FileSystemEventHandler
+from watchdog.observers import Observer
+
+from src import ocr
+from src.cache import ExtractionCache, content_hash
+from src.extractor import _extract_worker
+from src.store import HistoryStore
+
+REPORT_PATTERN = '【ゾーン別】売上実績*.pdf'
+SETTLE_SECONDS = 5.0
+# Give up waiting for a trailer after this long and let the extractor report the failure
+MAX_WAIT_SECONDS = 300.0
+POLL_SECONDS = 1.0
+# A file whose extraction fails this many times in a row (e.g. it kills its worker) is dropped
+MAX_ATTEMPTS = 3
+
+
+def _has_pdf_trailer(path):
+    try:
+        with open(path, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            f.seek(max(0, f.tell() - 1024))
+            return b'%%EOF' in f.read()
+    except OSError:
+        return False
+
+
+class _ReportEventHandler(FileSystemEventHandler):
+
+    def __init__(self, ingestor):
+        self.ingestor = ingestor
+
+    def on_created(self, event):
+        if not event.is_directory:
+            self.ingestor.notify(event.src_path)
+
+    def on_modified(self, event):
+        if not event.is_directory:
+            self.ingestor.notify(event.src_path)
+
+    def on_moved(self, event):
+        # Copy-to-temp-then-rename is the usual way reports land in the folder
+        if not event.is_directory:
+            self.ingestor.notify(event.dest_path)
+
+
+class FolderIngestor:
+    """
+    Watches `directory` and extracts each settled report once.
+
+    cache (ExtractionCache) and store (HistoryStore) default to the same locations
+    the app uses. At most `jobs` files are extracted at the same time.
+    Files already in the store (same content hash) are skipped; cache hits are
+    copied into the store without extracting.
+    """
+
+    def __init__(self, directory, cache=None, store=None, jobs=2, settle_seconds=SETTLE_SECONDS,
+                 pattern=REPORT_PATTERN, recursive=False):
+        self.directory = directory
+        self.cache = cache if cache is not None else ExtractionCache()
+        self.store = store if store is not None else HistoryStore()
+        self.jobs = max(1, jobs)
+        self.settle_seconds = settle_seconds
+        self.pattern = pattern
+        self.recursive = recursive
+
+        self._lock = threading.Lock()
+        self._pending = {}     # path -> (first seen, last event, (size, mtime))
+        self._in_flight = set()
+        self._attempts = {}    # path -> failed attempts so far
+        self._stop = threading.Event()
+        self._observer = None
+        self._poller = None
+        self._executor = None
+        self.counts = {'extracted': 0, 'cached': 0, 'skipped': 0, 'failed': 0}
+
+    def matches(self, path):
+        return fnmatch.fnmatch(os.path.basename(path), self.pattern)
+
+    def notify(self, path):
+        """
+        Records activity on `path`; it is extracted once it has been quiet for settle_seconds.
+        """
+        if not self.matches(path):
+            return
+        now = time.monotonic()
+        with self._lock:
+            first_seen = self._pending[path][0] if path in self._pending else now
+            self._pending[path] = (first_seen, now, None)
+
+    def scan(self):
+        """
+        Queues the reports already in the folder (e.g. those that arrived while the daemon was down).
+        """
+        for root, dirs, files in os.walk(self.directory):
+            for name in files:
+                self.notify(os.path.join(root, name))
+            if not self.recursive:
+                break
+
+    def _settled(self, now):
+        ready = []
+        with self._lock:
+            for path, (first_seen, last_event, last_stat) in list(self._pending.items()):
+                if path in self._in_flight or now - last_event < self.settle_seconds:
+                    continue
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    del self._pending[path]  # moved away or deleted before it settled
+                    continue
+                current = (st.st_size, st.st_mtime_ns)
+                if current != last_stat:
+                    # Still growing (or first check): wait another settle period
+                    self._pending[path] = (first_seen, now, current)
+                    continue
+                if not _has_pdf_trailer(path) and now - first_seen < MAX_WAIT_SECONDS:
+                    self._pending[path] = (first_seen, now, current)
+                    continue
+                del self._pending[path]
+                self._in_flight.add(path)
+                ready.append(path)
+        return ready
+
+    def poll(self, now=None):
+        """
+        One debounce pass: starts every settled file. Returns the paths started.
+        """
+        ready = self._settled(time.monotonic() if now is None else now)
+        for path in ready:
+            executor = self._executor
+            try:
+                self._start(path)
+            except Exception as e:
+                # e.g. the pool broke before its next submit, or the database is locked
+                print(f"[watcher] {os.path.basename(path)}: cannot start: {e}")
+                if isinstance(e, BrokenProcessPool):
+                    self._renew_executor(executor)
+                self._retry(path)
+        return ready
+
+    def _start(self, path):
+        filename = os.path.basename(path)
+        try:
+            with open(path, 'rb') as f:
+                digest = content_hash(f.read())
+        except OSError as e:
+            print(f"[watcher] cannot read {filename}: {e}")
+            self._finish(path, 'failed')
+            return
+
+        if self.store.has_source(digest):
+            self._finish(path, 'skipped')
+            return
+        key = self.cache.key(None, filename, digest)
+        df = self.cache.get(key)
+        if df is not None:
+            self.store.add_rows(df, digest)
+            print(f"[watcher] {filename}: from cache ({len(df)} rows)")
+            self._finish(path, 'cached')
+            return
+
+        with self._lock:
+            retried = path in self._attempts
+        # A retry gets a worker of its own: if the file is what kills workers, it breaks
+        # no pool but its own (and the files it shared the pool with are not blamed again)
+        executor = self._new_executor(1) if retried else self._executor
+        future = executor.submit(_extract_worker, path)
+        future.add_done_callback(lambda future: self._extracted(path, key, digest, executor, future))
+
+    def _extracted(self, path, key, digest, executor, future):
+        filename = os.path.basename(path)
+        try:
+            df = future.result()
+            self.cache.put(key, df)
+            rows = self.store.add_rows(df, digest)
+        except Exception as e:
+            # A killed worker breaks the whole pool: every file it held ends up here
+            # and is queued again on a new one
+            print(f"[watcher] {filename}: worker failed: {e}")
+            if isinstance(e, BrokenProcessPool):
+                self._renew_executor(executor)
+            self._retry(path)
+            return
+        finally:
+            if executor is not self._executor:
+                executor.shutdown(wait=False)
+        status = 'extracted' if rows else 'failed'
+        print(f"[watcher] {filename}: {status} ({rows} rows stored)")
+        self._finish(path, status)
+
+    def _finish(self, path, status):
+        with self._lock:
+            self._in_flight.discard(path)
+            self._attempts.pop(path, None)
+            self.counts[status] += 1
+
+    def _retry(self, path):
+        # Counted as failed; back to pending for another settle period, up to MAX_ATTEMPTS
+        now = time.monotonic()
+        with self._lock:
+            self._in_flight.discard(path)
+            self.counts['failed'] += 1
+            attempts = self._attempts.get(path, 0) + 1
+            if attempts >= MAX_ATTEMPTS:
+                self._attempts.pop(path, None)
+                print(f"[watcher] {os.path.basename(path)}: giving up after {attempts} attempts")
+                return
+            self._attempts[path] = attempts
+            if path not in self._pending:
+                self._pending[path] = (now, now, None)
+
+    def _new_executor(self, workers=None):
+        # The workers share one OCR memory budget (see src/ocr.py)
+        return ProcessPoolExecutor(max_workers=workers or self.jobs, initializer=ocr.init_pool_worker,
+                                   initargs=(self.jobs,))
+
+    def _renew_executor(self, broken):
+        # Replaces a broken pool once, however many of its futures report it
+        with self._lock:
+            if self._executor is not broken or self._stop.is_set():
+                return
+            self._executor = self._new_executor()
+        broken.shutdown(wait=False, cancel_futures=True)
+        print("[watcher] worker pool broke; started a new one")
+
+    def _poll_loop(self):
+        while not self._stop.wait(POLL_SECONDS):
+            try:
+                self.poll()
+            except Exception as e:
+                # Keep the daemon alive (failures of a single file are handled in poll)
+                print(f"[watcher] poll failed: {e}")
+
+    def start(self):
+        self._executor = self._new_executor()
+        self._observer = Observer()
+        self._observer.schedule(_ReportEventHandler(self), self.directory, recursive=self.recursive)
+        self._observer.start()
+        self.scan()
+        self._poller = threading.Thread(target=self._poll_loop, name='watcher-poll', daemon=True)
+        self._poller.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join()
+        if self._poller is not None:
+            self._poller.join()
+        with self._lock:
+            executor = self._executor
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def idle(self):
+        with self._lock:
+            return not self._pending and not self._in_flight
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counts, pending=len(self._pending), in_flight=len(self._in_flight))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Extract daily reports as they arrive in a folder.")
+    parser.add_argument('directory')
+    parser.add_argument('--jobs', type=int, default=2, help="files extracted at the same time")
+    parser.add_argument('--settle', type=float, default=SETTLE_SECONDS,
+                        help="seconds a file must stay unchanged before it is read")
+    parser.add_argument('--recursive', action='store_true')
+    parser.add_argument('--cache-dir', default=None)
+    parser.add_argument('--store', default=None, help="history database path")
+    args = parser.parse_args()
+
+    cache = ExtractionCache(args.cache_dir) if args.cache_dir else None
+    store = HistoryStore(args.store) if args.store else None
+    ingestor = FolderIngestor(args.directory, cache=cache, store=store, jobs=args.jobs,
+                              settle_seconds=args.settle, recursive=args.recursive)
+    ingestor.start()
+    print(f"[watcher] watching {args.directory} for {REPORT_PATTERN}")
+    try:
+        while True:
+            time.sleep(60)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        ingestor.stop()
+        print(f"[watcher] stopped: {ingestor.stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+import contextlib
+import io
+import sys
+
+from src.extractor import extract_from_pdf
+from src.synthetic import make_report_rows, report_filename, text_pdf_bytes
+
+print("Starting Text Engine Verification...")
+
+# 1. Text-layer reports in every layout the pdfium fast path may see, footer included
+date_str = '20260126'
+rows = make_report_rows(date_str)
+expected = len([row for row in rows if row['Zone'] != '准合計'])
+layouts = {
+    'ruled': text_pdf_bytes(date_str, rows, ruled=True),
+    'borderless': text_pdf_bytes(date_str, rows, ruled=False),
+    'footer': text_pdf_bytes(date_str, rows, ruled=True, footer=True),
+    'borderless footer': text_pdf_bytes(date_str, rows, ruled=False, footer=True),
+    'multipage': text_pdf_bytes(date_str, rows, rows_per_page=5, repeat_header=False, notes_page=True),
+}
+
+# 2. Both engines must return the same rows, and all of them
+failures = 0
+for name, pdf_bytes in layouts.items():
+    frames = {}
+    for engine in ('pdfplumber', 'pdfium'):
+        with contextlib.redirect_stdout(io.StringIO()):
+            frames[engine] = extract_from_pdf(io.BytesIO(pdf_bytes), filename=report_filename(date_str), engine=engine)
+    plumber, pdfium = frames['pdfplumber'], frames['pdfium']
+    ok = plumber.equals(pdfium) and len(pdfium) == expected
+    failures += not ok
+    print(f"{name:<18} pdfplumber {len(plumber)} rows, pdfium {len(pdfium)} rows "
+          f"({pdfium.attrs['extraction']['strategy']}), expected {expected}: {'ok' if ok else 'MISMATCH'}")
+
+print(f"\nLayouts checked: {len(layouts)}, mismatches: {failures}")
+print("Text Engine Verification Complete.")
+sys.exit(1 if failures else 0)
@@ -0,0 +1,44 @@
+import io
+import sys
+
+from src import ocr
+from src.extractor import extract_from_pdf
+from src.synthetic import make_report_rows, report_filename, scan_pdf_bytes
+
+print("Starting OCR Path Verification (fake engine)...")
+
+# 1. A scanned report fed in upside down, and what Tesseract would read from it
+date_str = '20260126'
+rows = make_report_rows(date_str, seed=1)
+pdf_bytes = scan_pdf_bytes(date_str, rows, rotate=180, dpi=200)
+text = "ブロック／業種 コード 純売上高 前年比 客数 前年比\n" + "\n".join(
+    f"{row['Zone']} {i:03d} {row['Sales']:,} {row['Sales_YoY']:.1f} {row['Count']:,} {row['Count_YoY']:.1f}"
+    for i, row in enumerate(rows, start=1))
+
+# 2. OSD answers 180 (clockwise); the probe finds the header line 175px into the half-size strip
+engine = ocr.FakeOcrEngine(text=text, lines=[('ゾーン別売上実績', 20), ('ブロック／業種コード純売上高', 175)],
+                           rotate=180, latency=0.01)
+previous = ocr.set_engine(engine)
+try:
+    df = extract_from_pdf(io.BytesIO(pdf_bytes), filename=report_filename(date_str), engine='pdfplumber')
+finally:
+    ocr.set_engine(previous)
+
+# 3. Rows (the OCR parser drops spaces in zone names), calls and the cropped full-resolution pass
+record = df.attrs['extraction']
+truth = {row['Zone'].strip('【】').replace(' ', ''): (row['Sales'], row['Count']) for row in rows}
+matched = sum(truth.get(zone.strip('【】').replace(' ', '')) == (sales, count)
+              for zone, sales, count in zip(df['Zone'].astype(str), df['Sales'], df['Count']))
+print(f"Strategy: {record['strategy']}, angle: {record['ocr_angle']}, rows parsed: {len(df)}, "
+      f"matching the ground truth: {matched}")
+print(f"Calls: {[kind for kind, size in engine.images]}")
+full = record['page_width'] * record['page_height'] * (300 / 72) ** 2
+print(f"Full-resolution OCR: {record['ocr_pixels'] / 1e6:.2f} Mpx of {full / 1e6:.2f} Mpx")
+print(f"Engine stats: {engine.stats()}")
+
+# 4. Every ground-truth row (准合計 is dropped on purpose) must come back
+expected = len([row for row in rows if row['Zone'] != '准合計'])
+if len(df) < expected or matched < expected:
+    print(f"FAIL: {len(df)} rows parsed, {matched} matching, {expected} expected")
+print("\nOCR Path Verification Complete.")
+sys.exit(1 if len(df) < expected or matched < expected else 0)
@@ -0,0 +1,108 @@
+import sys
+import threading
+import time
+import types
+
+from PIL import Image
+
+from src import ocr
+
+print("Starting Tesserocr Engine Verification...")
+
+# 1. The pool, TSV parsing and OSD mapping of TesserocrEngine, on stand-in APIs
+# (PyTessBaseAPI's calls as the engine uses them), so this runs without traineddata
+# GetTSVText rows (no heading line; that is only written by Tesseract's TSV renderer)
+TSV = ("1\t1\t0\t0\t0\t0\t0\t0\t200\t100\t-1\t\n"
+       "5\t1\t1\t1\t1\t1\t10\t20\t80\t12\t91.5\t純売上高\n")
+
+
+class StandInApi:
+    busy = 0
+    max_busy = 0
+    lock = threading.Lock()
+
+    def __init__(self, lang, **kwargs):
+        self.lang = lang
+        self.image = None
+        self.ended = False
+
+    def SetImage(self, img):
+        assert self.image is None, "API handed out while in use"
+        self.image = img
+        with StandInApi.lock:
+            StandInApi.busy += 1
+            StandInApi.max_busy = max(StandInApi.max_busy, StandInApi.busy)
+
+    def GetUTF8Text(self):
+        time.sleep(0.01)
+        return f"{self.lang} {self.image.size}"
+
+    def GetTSVText(self, page):
+        return TSV
+
+    def DetectOrientationScript(self):
+        return {'orient_deg': 90}
+
+    def Clear(self):
+        with StandInApi.lock:
+            StandInApi.busy -= 1
+        self.image = None
+
+    def End(self):
+        self.ended = True
+
+
+class StandInEngine(ocr.TesserocrEngine):
+    def _api(self, lang, **kwargs):
+        return StandInApi(lang, **kwargs)
+
+
+if ocr.tesserocr is None:
+    # Only PSM.OSD_ONLY is read from the module
+    ocr.tesserocr = types.SimpleNamespace(PSM=types.SimpleNamespace(OSD_ONLY=0))
+
+failures = []
+engine = StandInEngine(workers=2)
+img = Image.new('L', (200, 100), 255)
+threads = [threading.Thread(target=engine.image_to_string, args=(img,)) for _ in range(8)]
+for thread in threads:
+    thread.start()
+for thread in threads:
+    thread.join()
+data = engine.image_to_data(img)
+osd = engine.image_to_osd(img)
+stats = engine.stats()
+engine.close()
+
+if StandInApi.max_busy > 2:
+    failures.append(f"{StandInApi.max_busy} APIs in use at once with 2 workers")
+if any(api.image is not None for api in engine._apis):
+    failures.append("an API was not cleared after its call")
+if data['text'] != ['', '純売上高'] or data['top'] != [0, 20] or data['conf'] != [-1, 91]:
+    failures.append(f"TSV parsed as {data}")
+if osd != {'rotate': 270}:
+    failures.append(f"OSD orient_deg 90 mapped to {osd}")
+if stats['calls'] != 10 or stats['errors']:
+    failures.append(f"stats {stats}")
+if not all(api.ended for api in engine._apis + [engine._osd_api]):
+    failures.append("close() did not end every API")
+print(f"Stand-in pool: max APIs in use {StandInApi.max_busy}/2, stats {stats}")
+
+# 2. The real library, where it is installed with jpn traineddata
+real = ocr.create_engine()
+if isinstance(real, ocr.TesserocrEngine):
+    from src.render import PageRenderer
+    from src.synthetic import make_report_rows, scan_pdf_bytes
+    with PageRenderer(scan_pdf_bytes('20260126', make_report_rows('20260126'), dpi=200)) as renderer:
+        text = real.image_to_string(Image.fromarray(renderer.render(300)))
+    if '純売上高' not in text.replace(' ', ''):
+        failures.append(f"real tesserocr did not read the header: {text[:200]!r}")
+    print(f"Real tesserocr ({real.path}): {real.stats()}")
+    real.close()
+else:
+    print(f"Real tesserocr not available here (engine: {real.name if real else None}); skipped.")
+
+for failure in failures:
+    print(f"FAIL: {failure}")
+print("\nTesserocr Engine Verification Complete.")
+sys.exit(1 if failures else 0)